@@ -1,9 +1,11 @@
 # app.py
 from flask import Flask, request, jsonify
 from flask.typing import ResponseReturnValue
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import os
-from db import SessionLocal, init_db
+import re
+from sqlalchemy import insert
+from db import ScopedSession, init_db
 from official import compute_official_order, write_official_and_award_points
 from models import Penalty
 
@@ -11,20 +13,56 @@ app = Flask(__name__)
 init_db()
 
 
-def _kart_to_driver_id(db, session_id: int, kart_number: str) -> Optional[int]:
-    """Resolve a kart number to a driver_id within the session's event/class."""
-    from models import Session as RaceSession, Entry
-    sess = db.get(RaceSession, session_id)
-    if not sess:
-        return None
-    e = (
-        db.query(Entry)
-          .filter(Entry.event_id == sess.event_id,
-                  Entry.class_id == sess.class_id,
-                  Entry.number == kart_number)
-          .first()
-    )
-    return e.driver_id if e else None
+@app.teardown_appcontext
+def _remove_session(_exc: Optional[BaseException] = None) -> None:
+    # closes (and rolls back, if uncommitted) this thread's request session
+    ScopedSession.remove()
+
+# One bulk item: "<kart> DQ" | "<kart> [+-]<n>pos" | "<kart> [+-]<n>[.n]s"
+_PENALTY_RE = re.compile(
+    r"(?P<num>[^\s|]+)[ \t]+"
+    r"(?:(?P<dq>dq)|(?P<sign>[+-]?)(?P<mag>\d+(?:\.\d+)?)(?P<unit>pos|s)(?!\w))"
+    r"[^|\n]*",
+    re.IGNORECASE,
+)
+
+
+class KartResolver:
+    """Resolve kart numbers to driver_ids within one session's event/class.
+
+    The session row is loaded once; each kart number hits the DB at most once
+    per resolver, and prefetch() resolves a whole batch with one IN query.
+    """
+
+    def __init__(self, db, session_id: int):
+        from models import Session as RaceSession
+        self.db = db
+        self.sess = db.get(RaceSession, session_id)
+        self._cache: Dict[str, Optional[int]] = {}
+
+    def prefetch(self, kart_numbers: Iterable[str]) -> None:
+        from models import Entry
+        wanted = [n for n in set(kart_numbers) if n not in self._cache]
+        if not wanted:
+            return
+        for n in wanted:
+            self._cache[n] = None
+        if not self.sess:
+            return
+        rows = (
+            self.db.query(Entry.number, Entry.driver_id)
+              .filter(Entry.event_id == self.sess.event_id,
+                      Entry.class_id == self.sess.class_id,
+                      Entry.number.in_(wanted))
+              .all()
+        )
+        for num, did in rows:
+            self._cache[num] = did
+
+    def resolve(self, kart_number: str) -> Optional[int]:
+        if kart_number not in self._cache:
+            self.prefetch((kart_number,))
+        return self._cache[kart_number]
 
 @app.post("/sessions/<int:sid>/penalties")
 def add_penalties(sid: int) -> ResponseReturnValue:
@@ -33,77 +71,79 @@ def add_penalties(sid: int) -> ResponseReturnValue:
     - JSON: [{"driver_id":7, "type":"POSITION", "value_positions":3, "note":"start infraction"}, ...]
     - text/plain bulk: '541 +5s | 077 DQ | 119 -3pos'
     """
-    with SessionLocal() as db:
-        if request.is_json:
-            payload = request.get_json(force=True)
-            for p in payload:
-                db.add(Penalty(
-                    session_id=sid,
-                    driver_id=p["driver_id"],
-                    type=p["type"],
-                    value_ms=p.get("value_ms"),
-                    value_positions=p.get("value_positions"),
-                    lap_no=p.get("lap_no"),
-                    note=p.get("note"),
-                    source=p.get("source","Stewards")
-                ))
-            db.commit()
-            return jsonify({"ok": True})
-        else:
-            # minimal bulk parser (extend as needed)
-            bulk = request.data.decode("utf-8")
-            items = [x.strip() for x in bulk.replace("\n","|").split("|") if x.strip()]
-            not_found: list[str] = []
-            for it in items:
-                # "541 +5s" or "077 DQ" or "119 -3pos"
-                parts = it.split()
-                if len(parts) < 2:
-                    continue
-                num = parts[0]
-                code = parts[1].lower()
-                driver_id = _kart_to_driver_id(db, sid, num)
-                if not driver_id:
-                    not_found.append(num)
+    db = ScopedSession()
+    if request.is_json:
+        payload = request.get_json(force=True)
+        rows = [{
+            "session_id": sid,
+            "driver_id": p["driver_id"],
+            "type": p["type"],
+            "value_ms": p.get("value_ms"),
+            "value_positions": p.get("value_positions"),
+            "lap_no": p.get("lap_no"),
+            "note": p.get("note"),
+            "source": p.get("source","Stewards"),
+        } for p in payload]
+        if rows:
+            # one executemany instead of a unit-of-work flush per object
+            db.execute(insert(Penalty), rows)
+        db.commit()
+        return jsonify({"ok": True})
+    else:
+        # minimal bulk parser (extend as needed)
+        bulk = request.data.decode("utf-8")
+        # Parse everything first so kart numbers resolve in a single query
+        parsed: List[Tuple[str, str, Optional[int]]] = []
+        for m in _PENALTY_RE.finditer(bulk):
+            # "541 +5s" or "077 DQ" or "119 -3pos"
+            unit = (m.group("unit") or "").lower()
+            mag = m.group("mag")
+            if m.group("dq"):
+                parsed.append((m.group("num"), "DQ", None))
+            elif unit == "pos":
+                if "." in mag:
                     continue
-                if "dq" in code:
-                    db.add(Penalty(session_id=sid, driver_id=driver_id, type="DQ"))
-                elif "pos" in code:
-                    try:
-                        drop = int(code.replace("pos","" ).replace("-",""))
-                    except ValueError:
-                        continue
-                    db.add(Penalty(session_id=sid, driver_id=driver_id, type="POSITION", value_positions=drop))
-                elif code.endswith("s"):
-                    try:
-                        ms = int(float(code[:-1]) * 1000)
-                    except ValueError:
-                        continue
-                    db.add(Penalty(session_id=sid, driver_id=driver_id, type="TIME", value_ms=ms))
-            db.commit()
-        return jsonify({"ok": True, "missing_numbers": not_found})
-    # Fallback (should not hit)
-    return jsonify({"ok": True})
+                parsed.append((m.group("num"), "POSITION", int(mag)))
+            else:
+                parsed.append((m.group("num"), "TIME", int(float(m.group("sign") + mag) * 1000)))
+
+        karts = KartResolver(db, sid)
+        karts.prefetch(num for num, _, _ in parsed)
+        not_found: list[str] = []
+        rows: List[Dict[str, Any]] = []
+        for num, ptype, value in parsed:
+            driver_id = karts.resolve(num)
+            if not driver_id:
+                not_found.append(num)
+                continue
+            rows.append({
+                "session_id": sid,
+                "driver_id": driver_id,
+                "type": ptype,
+                "value_ms": value if ptype == "TIME" else None,
+                "value_positions": value if ptype == "POSITION" else None,
+            })
+        if rows:
+            db.execute(insert(Penalty), rows)
+        db.commit()
+    return jsonify({"ok": True, "missing_numbers": not_found})
 
 @app.post("/sessions/<int:sid>/preview_official")
 def preview_official(sid: int) -> ResponseReturnValue:
-    with SessionLocal() as db:
-        officials = compute_official_order(db, sid)
-        return jsonify([{
-            "driver_id": r.driver_id,
-            "position": r.position,
-            "status_code": r.status_code,
-            "best_lap_ms": r.best_lap_ms
-        } for r in officials])
-    # Fallback
-    return jsonify([])
+    db = ScopedSession()
+    officials = compute_official_order(db, sid)
+    return jsonify([{
+        "driver_id": r.driver_id,
+        "position": r.position,
+        "status_code": r.status_code,
+        "best_lap_ms": r.best_lap_ms
+    } for r in officials])
 
 @app.post("/sessions/<int:sid>/publish_official")
 def publish_official(sid: int) -> ResponseReturnValue:
-    with SessionLocal() as db:
-        write_official_and_award_points(db, sid, scheme_name="SKUSA_SN28")
-        return jsonify({"ok": True})
-    # Fallback
-    return jsonify({"ok": False})
+    db = ScopedSession()
+    write_official_and_award_points(db, sid, scheme_name="SKUSA_SN28")
+    return jsonify({"ok": True})
 
 
 def main():
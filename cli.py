@@ -3,6 +3,7 @@ import argparse
 import os
 import threading
 import logging
+from typing import Callable
 
 
 def run_socket_listener(host: str, port: int):
@@ -104,6 +105,7 @@ def main():
 
     if args.cmd == "run":
         threads: list[threading.Thread] = []
+        services: list[tuple[str, Callable[..., None], tuple]] = []
 
         # If user specified 'run' but no components toggled, default to UI + listener
         if not (args.listen or args.api or args.ui):
@@ -115,32 +117,39 @@ def main():
             os.environ["SN28_LISTENER_RUNNING"] = "1"
             os.environ["SN28_LISTENER_HOST"] = str(args.listen_host)
             os.environ["SN28_LISTENER_PORT"] = str(args.listen_port)
-            t = threading.Thread(target=run_socket_listener, args=(args.listen_host, args.listen_port), daemon=True)
-            t.start(); threads.append(t)
-            # Expose the launcher thread to the socket_listener module so UI can attach
-            try:
-                import socket_listener as _sl
-                _sl._launched_thread = t
-            except Exception:
-                pass
-            logging.info("Listener thread started on %s:%s", args.listen_host, args.listen_port)
+            services.append(("sn28-listener", run_socket_listener, (args.listen_host, args.listen_port)))
+            logging.info("Listener starting on %s:%s", args.listen_host, args.listen_port)
 
         if args.api:
-            t = threading.Thread(target=run_api, args=(args.api_host, args.api_port), daemon=True)
-            t.start(); threads.append(t)
+            services.append(("sn28-api", run_api, (args.api_host, args.api_port)))
             logging.info("API server starting on http://%s:%s", args.api_host, args.api_port)
 
-        # UI should run on main thread if requested
+        # The UI owns the main thread when requested; otherwise the last
+        # service runs there instead of parking the main thread in join().
+        inline = None if args.ui else services.pop()
+
+        for name, target, targs in services:
+            t = threading.Thread(target=target, args=targs, daemon=True, name=name)
+            t.start(); threads.append(t)
+            if target is run_socket_listener:
+                # Expose the launcher thread to the socket_listener module so UI can attach
+                try:
+                    import socket_listener as _sl
+                    _sl._launched_thread = t
+                except Exception:
+                    pass
+
         if args.ui:
             run_ui()
         else:
-            # If no UI, keep process alive if any threads running
+            _name, target, targs = inline
             try:
+                target(*targs)
+                # keep process alive while any other service is still running
                 for t in threads:
                     t.join()
             except KeyboardInterrupt:
                 pass
 
-
 if __name__ == "__main__":
     main()
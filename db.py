@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 
 def _data_dir() -> Path:
@@ -30,9 +30,129 @@ def _default_db_path() -> Path:
 _DB_PATH = _default_db_path()
 _DB_URL = "sqlite:///" + str(_DB_PATH).replace("\\", "/")
 
-engine = create_engine(_DB_URL, echo=False, future=True)
+# Listener, UI and API threads share this file: wait on locks instead of
+# failing fast with "database is locked".
+engine = create_engine(_DB_URL, echo=False, future=True, connect_args={"timeout": 30})
+
+# WAL lets UI/API readers run alongside the ingest writer, and with
+# synchronous=NORMAL a commit no longer waits on an fsync (only checkpoints do).
+_SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "mmap_size=268435456",
+    "cache_size=-65536",
+    "temp_store=MEMORY",
+    # SQLite ships with FK enforcement off; the models rely on ON DELETE CASCADE
+    "foreign_keys=ON",
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, _conn_record):
+    cur = dbapi_conn.cursor()
+    try:
+        for pragma in _SQLITE_PRAGMAS:
+            cur.execute("PRAGMA " + pragma)
+    finally:
+        cur.close()
+
+
+# Indexes replaced by wider ones in models.py; dropped from existing DB files.
+_RETIRED_INDEXES = (
+    "ix_laps_session_driver_time",  # superseded by ix_laps_valid_best
+    "ix_laps_best",                 # superseded by ix_laps_valid_best (partial)
+    "ix_sessions_status",           # superseded by ix_sessions_live (partial)
+    "ix_results_session_basis_version",  # superseded by ix_results_latest
+    "ix_laps_session_id",           # prefix of the laps primary key
+)
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
 
+# Thread-local session registry for the Flask API: a request reuses its
+# thread's session instead of building one per handler, and the app's
+# teardown hook calls ScopedSession.remove(). Everything else keeps using
+# plain SessionLocal() context blocks.
+ScopedSession = scoped_session(SessionLocal)
+
+
+def _recode_enum_columns(conn, metadata) -> None:
+    """Rewrite full enum names left by older builds into CodedEnum codes."""
+    from models import CodedEnum
+    for table in metadata.sorted_tables:
+        for col in table.columns:
+            if not isinstance(col.type, CodedEnum):
+                continue
+            # plain SQL on purpose: bound through the column type, the names
+            # would be encoded before the comparison
+            codes = col.type.to_code
+            whens = " ".join("WHEN ? THEN ?" for _ in codes)
+            marks = ", ".join("?" for _ in codes)
+            params = [v for pair in codes.items() for v in pair] + list(codes)
+            conn.exec_driver_sql(
+                f'UPDATE "{table.name}" SET "{col.name}" = CASE "{col.name}" {whens} END '
+                f'WHERE "{col.name}" IN ({marks})',
+                tuple(params),
+            )
+
+
+def _migrate_lap_timestamps(conn) -> None:
+    """Move laps.timestamp (DATETIME text) from older builds to epoch-ms timestamp_ms."""
+    cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(laps)")}
+    if "timestamp" not in cols or "timestamp_ms" in cols:
+        return
+    # the old session/time index is on the column being dropped; the index
+    # sync in init_db() rebuilds it over timestamp_ms
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_laps_session_ts")
+    conn.exec_driver_sql("ALTER TABLE laps ADD COLUMN timestamp_ms BIGINT NOT NULL DEFAULT 0")
+    conn.exec_driver_sql(
+        "UPDATE laps SET timestamp_ms = "
+        "CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER)"
+    )
+    conn.exec_driver_sql("ALTER TABLE laps DROP COLUMN timestamp")
+
+
+def _rebuild_laps_without_rowid(conn) -> None:
+    """Re-create a rowid laps table from older builds as WITHOUT ROWID on its natural key."""
+    from models import Lap
+    row = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'laps'"
+    ).first()
+    if row is None or "WITHOUT ROWID" in row[0].upper():
+        return
+    conn.exec_driver_sql("ALTER TABLE laps RENAME TO laps_rowid")
+    # the renamed table keeps its indexes (and their names); free the names
+    # for the new table's indexes
+    old_indexes = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'laps_rowid' "
+        "AND sql IS NOT NULL"
+    ).scalars().all()
+    for name in old_indexes:
+        conn.exec_driver_sql(f'DROP INDEX "{name}"')
+    Lap.__table__.create(conn)
+    # older builds did not check lap values; rows the new CHECK constraints
+    # would reject must not stop startup. A non-positive time is kept as an
+    # unknown (NULL) time; a non-positive lap number cannot be repaired.
+    bad_times, bad_numbers = conn.exec_driver_sql(
+        "SELECT COALESCE(SUM(lap_time_ms IS NOT NULL AND lap_time_ms <= 0 AND lap_number > 0), 0), "
+        "COALESCE(SUM(lap_number IS NULL OR lap_number <= 0), 0) FROM laps_rowid"
+    ).one()
+    if bad_times or bad_numbers:
+        import logging
+        logging.getLogger(__name__).warning(
+            "laps rebuild: cleared %d non-positive lap time(s), dropped %d lap(s) "
+            "with a non-positive lap number", bad_times, bad_numbers,
+        )
+    names = [c.name for c in Lap.__table__.columns]
+    cols = ", ".join(names)
+    select = ", ".join(
+        "CASE WHEN lap_time_ms > 0 THEN lap_time_ms END" if n == "lap_time_ms" else n
+        for n in names
+    )
+    conn.exec_driver_sql(
+        f"INSERT INTO laps ({cols}) SELECT {select} FROM laps_rowid WHERE lap_number > 0"
+    )
+    conn.exec_driver_sql("DROP TABLE laps_rowid")
+
 
 def init_db():
     """Initialize database schema if not present.
@@ -54,6 +174,18 @@ def init_db():
     # Create tables if missing (this will not overwrite an existing DB file)
     Base.metadata.create_all(bind=engine)
 
+    # create_all() only builds indexes along with new tables; bring existing
+    # DB files up to date with the current index set.
+    with engine.begin() as conn:
+        _migrate_lap_timestamps(conn)
+        _rebuild_laps_without_rowid(conn)
+        for table in Base.metadata.sorted_tables:
+            for ix in table.indexes:
+                ix.create(conn, checkfirst=True)
+        for name in _RETIRED_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+        _recode_enum_columns(conn, Base.metadata)
+
     # Auto-seed default points scheme if not present. Only insert rows when
     # the Point scheme is absent to avoid duplicates. This covers the case
     # where a DB file exists but the points were not yet seeded.
@@ -77,13 +209,15 @@ def init_db():
             db.flush()
 
             # Heat scale: position 1 -> 0 points, others map to their position
-            for position in range(1, 121):
-                heat_points = 0 if position == 1 else position
-                db.add(PointScale(point_id=pt.id, session_type="Heat", position=position, points=heat_points))
-
+            rows = [{"point_id": pt.id, "session_type": "Heat", "position": position,
+                     "points": 0 if position == 1 else position}
+                    for position in range(1, 121)]
             # Qualifying scale: store 1..N (rendered elsewhere as fractional hundredths)
-            for position in range(1, 121):
-                db.add(PointScale(point_id=pt.id, session_type="Qualifying", position=position, points=position))
+            rows += [{"point_id": pt.id, "session_type": "Qualifying", "position": position,
+                      "points": position}
+                     for position in range(1, 121)]
+            # single executemany rather than 240 ORM unit-of-work inserts
+            db.execute(insert(PointScale), rows)
 
             db.commit()
             logger.info("Seeding complete: SKUSA_SN28 inserted with %d heat entries", 120)
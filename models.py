@@ -1,11 +1,12 @@
 from __future__ import annotations
-from datetime import datetime, date
-from typing import List, Optional
+from datetime import datetime, date, timezone
+from typing import Dict, List, Optional
 
 from sqlalchemy import (
-    String, Integer, BigInteger, Date, DateTime, Enum, Text, ForeignKey,
-    UniqueConstraint, CheckConstraint, Index, func, Boolean, text
+    String, Integer, BigInteger, SmallInteger, Date, DateTime, Text, ForeignKey,
+    UniqueConstraint, CheckConstraint, PrimaryKeyConstraint, Index, func, Boolean, text
 )
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship, DeclarativeBase, Mapped, mapped_column
 
 
@@ -13,11 +14,35 @@ class Base(DeclarativeBase):
     pass
 
 # --- Enums ---
-SessionTypeEnum = Enum("Practice", "Qualifying", "Heat", "Prefinal","Final", name="session_type_enum")
-BasisEnum = Enum("provisional", "official", name="basis_enum")
-ResultStatusEnum = Enum("FINISH", "DNF", "DQ", "DNS", name="result_status_enum")
-PenaltyTypeEnum = Enum("TIME", "POSITION", "DQ", "LAP_INVALID", name="penalty_type_enum")
-SessionStatusEnum = Enum("live", "provisional", "official", "cancelled", name="session_status_enum")
+class CodedEnum(TypeDecorator):
+    """Enum stored as a one-character code.
+
+    Python code keeps using the full names ("provisional", "Qualifying", ...);
+    only the column holds "P", "Q", ... which keeps rows and the composite
+    indexes these columns sit in narrow. Values outside the mapping are
+    stored as given, like the non-native Enum this replaces.
+    """
+    impl = String(1)
+    cache_ok = True
+
+    def __init__(self, codes: Dict[str, str]):
+        super().__init__()
+        self.codes = tuple(codes.items())  # hashable: part of the statement cache key
+        self.to_code = dict(codes)
+        self.to_name = {code: name for name, code in codes.items()}
+
+    def process_bind_param(self, value, dialect):
+        return self.to_code.get(value, value)
+
+    def process_result_value(self, value, dialect):
+        return self.to_name.get(value, value)
+
+
+SessionTypeEnum = CodedEnum({"Practice": "P", "Qualifying": "Q", "Heat": "H", "Prefinal": "R", "Final": "F"})
+BasisEnum = CodedEnum({"provisional": "P", "official": "O"})
+ResultStatusEnum = CodedEnum({"FINISH": "F", "DNF": "N", "DQ": "Q", "DNS": "S"})
+PenaltyTypeEnum = CodedEnum({"TIME": "T", "POSITION": "P", "DQ": "Q", "LAP_INVALID": "L"})
+SessionStatusEnum = CodedEnum({"live": "L", "provisional": "P", "official": "O", "cancelled": "C"})
 
 # --- Core ---
 class Driver(Base):
@@ -30,10 +55,14 @@ class Driver(Base):
     team: Mapped[Optional[str]] = mapped_column(String(128))   
     chassis: Mapped[Optional[str]] = mapped_column(String(128)) 
 
-    laps: Mapped[List["Lap"]] = relationship("Lap", back_populates="driver", cascade="all, delete-orphan")
-    results: Mapped[List["Result"]] = relationship("Result", back_populates="driver", cascade="all, delete-orphan")
-    points: Mapped[List["PointAward"]] = relationship("PointAward", back_populates="driver", cascade="all, delete-orphan")
-    entries: Mapped[List["Entry"]] = relationship("Entry", back_populates="driver", cascade="all, delete-orphan")
+    # Collections are lazy="raise": query the child table (or selectinload)
+    # instead of walking them per row. passive_deletes leaves removing
+    # unloaded children to the FKs' ON DELETE CASCADE (foreign_keys=ON in
+    # db.py) instead of SELECTing them just to delete them row by row.
+    laps: Mapped[List["Lap"]] = relationship("Lap", back_populates="driver", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    results: Mapped[List["Result"]] = relationship("Result", back_populates="driver", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    points: Mapped[List["PointAward"]] = relationship("PointAward", back_populates="driver", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    entries: Mapped[List["Entry"]] = relationship("Entry", back_populates="driver", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
     def __repr__(self) -> str:
         return f"<Driver {self.first_name} {self.last_name}>"
@@ -47,9 +76,9 @@ class Event(Base):
     end_date: Mapped[date] = mapped_column(Date, nullable=False)
     location: Mapped[Optional[str]] = mapped_column(String(256))
 
-    classes: Mapped[List["RaceClass"]] = relationship("RaceClass", back_populates="event", cascade="all, delete-orphan")
-    sessions: Mapped[List["Session"]] = relationship("Session", back_populates="event", cascade="all, delete-orphan")
-    entries: Mapped[List["Entry"]] = relationship("Entry", back_populates="event", cascade="all, delete-orphan")
+    classes: Mapped[List["RaceClass"]] = relationship("RaceClass", back_populates="event", cascade="all, delete-orphan", lazy="raise")
+    sessions: Mapped[List["Session"]] = relationship("Session", back_populates="event", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    entries: Mapped[List["Entry"]] = relationship("Entry", back_populates="event", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
 
 class RaceClass(Base):
@@ -60,8 +89,8 @@ class RaceClass(Base):
     name: Mapped[str] = mapped_column(String(64), nullable=False)
 
     event: Mapped[Event] = relationship(back_populates="classes")
-    sessions: Mapped[List["Session"]] = relationship(back_populates="race_class", cascade="all, delete-orphan")
-    entries: Mapped[List["Entry"]] = relationship("Entry", back_populates="race_class", cascade="all, delete-orphan")
+    sessions: Mapped[List["Session"]] = relationship(back_populates="race_class", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    entries: Mapped[List["Entry"]] = relationship("Entry", back_populates="race_class", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
     __table_args__ = (
         UniqueConstraint("event_id", "name", name="uq_class_event_name"),
@@ -78,17 +107,23 @@ class Session(Base):
     session_name: Mapped[Optional[str]] = mapped_column(String(120))
     started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     ended_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
-    status: Mapped[str] = mapped_column(SessionStatusEnum, default="live", index=True)
+    status: Mapped[str] = mapped_column(SessionStatusEnum, default="live")
 
     event: Mapped[Event] = relationship(back_populates="sessions")
-    race_class: Mapped[RaceClass] = relationship(back_populates="sessions")
+    # class name is shown wherever a session is, so fetch it in the same SELECT
+    race_class: Mapped[RaceClass] = relationship(back_populates="sessions", lazy="joined")
 
-    laps: Mapped[List["Lap"]] = relationship(back_populates="session", cascade="all, delete-orphan")
-    results: Mapped[List["Result"]] = relationship(back_populates="session", cascade="all, delete-orphan")
-    penalties: Mapped[List["Penalty"]] = relationship(back_populates="session", cascade="all, delete-orphan")
+    laps: Mapped[List["Lap"]] = relationship(back_populates="session", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    results: Mapped[List["Result"]] = relationship(back_populates="session", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    penalties: Mapped[List["Penalty"]] = relationship(back_populates="session", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
     __table_args__ = (
         UniqueConstraint("event_id", "class_id", "session_name", name="uq_session_event_class_name"),
+        # only the (few) live sessions are ever looked up by status; 'L' is
+        # the stored SessionStatusEnum code for "live"
+        Index("ix_sessions_live", "status", sqlite_where=text("status = 'L'"),
+              postgresql_where=text("status = 'L'")),
+        CheckConstraint("ended_at IS NULL OR ended_at >= started_at", name="ck_session_ended_after_start"),
     )
 
 
@@ -119,25 +154,44 @@ class Entry(Base):
 class Lap(Base):
     __tablename__ = "laps"
     __table_args__ = (
-        UniqueConstraint('session_id', 'driver_id', 'lap_number', name='uq_session_driver_lap'),
-        Index('ix_laps_session_driver_time', 'session_id', 'driver_id', 'lap_time_ms'),
+        # laps are always read per session/driver in lap order, so the natural
+        # key is the clustered primary key (no surrogate id, no separate
+        # unique index to maintain on insert)
+        PrimaryKeyConstraint('session_id', 'driver_id', 'lap_number', name='pk_laps'),
+        # best-valid-lap lookups (session, driver, is_valid=1 ORDER BY time, lap)
+        # are answered from the index alone; invalidated laps are left out
+        Index('ix_laps_valid_best', 'session_id', 'driver_id', 'lap_time_ms', 'lap_number',
+              sqlite_where=text("is_valid = 1"), postgresql_where=text("is_valid")),
         Index('ix_laps_session_lapno', 'session_id', 'lap_number'),
-        Index('ix_laps_session_ts', 'session_id', 'timestamp'),
-        {"sqlite_autoincrement": True},  # ensure AUTOINCREMENT on SQLite
+        Index('ix_laps_session_ts', 'session_id', 'timestamp_ms'),
+        CheckConstraint("lap_time_ms IS NULL OR lap_time_ms > 0", name="ck_lap_time_pos"),
+        CheckConstraint("lap_number > 0", name="ck_lap_number_pos"),
+        {"sqlite_with_rowid": False},  # SQLite stores rows in the PK B-tree
     )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)      # INTEGER PRIMARY KEY
-    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id", ondelete="CASCADE"), index=True)
+    # Columns are declared widest first (8-byte timestamp, then 4-byte ints,
+    # then the 2-byte lap number and the bool) so servers that align row
+    # fields don't pad between them.
+    # crossing time as UTC epoch milliseconds: an 8-byte int that indexes and
+    # compares as an integer and costs no datetime construction on load
+    timestamp_ms: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id", ondelete="CASCADE"))
     driver_id: Mapped[int] = mapped_column(ForeignKey("drivers.id", ondelete="CASCADE"), index=True)
-
-    lap_number: Mapped[int] = mapped_column(Integer, nullable=False)
     lap_time_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # <- safer
-    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    lap_number: Mapped[int] = mapped_column(SmallInteger, nullable=False)
     is_valid: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("1"))
 
     session: Mapped["Session"] = relationship(back_populates="laps")
     driver: Mapped["Driver"] = relationship(back_populates="laps")
 
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=timezone.utc)
+
+    @timestamp.setter
+    def timestamp(self, value: datetime) -> None:
+        self.timestamp_ms = int(value.timestamp() * 1000)
+
 
 class Penalty(Base):
     __tablename__ = "penalties"
@@ -179,7 +233,8 @@ class Result(Base):
     driver: Mapped[Driver] = relationship(back_populates="results")
 
     __table_args__ = (
-        Index("ix_results_session_basis_version", "session_id", "basis", "version"),
+        # "latest version of this session's snapshot" is a single index dive
+        Index("ix_results_latest", "session_id", "basis", text("version DESC")),
         Index("ix_results_session_position", "session_id", "position"),
         UniqueConstraint("session_id", "driver_id", "basis", "version", name="uq_result_versioned_row"),
         CheckConstraint("position IS NULL OR position > 0", name="ck_result_pos_pos"),
@@ -194,7 +249,7 @@ class Point(Base):
     bonus_lap: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("0"))
     bonus_pole: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default=text("0"))
 
-    scales: Mapped[List["PointScale"]] = relationship(back_populates="point", cascade="all, delete-orphan")
+    scales: Mapped[List["PointScale"]] = relationship(back_populates="point", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
 
 class PointScale(Base):
@@ -233,6 +288,7 @@ class PointAward(Base):
     session: Mapped[Session] = relationship()
 
     __table_args__ = (
+        Index("ix_points_latest", "session_id", "basis", text("version DESC")),
         UniqueConstraint("session_id", "driver_id", "basis", "version", name="uq_points_versioned_row"),
     )
 
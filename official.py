@@ -1,17 +1,20 @@
 # official.py
 from __future__ import annotations
+from collections import defaultdict
 from dataclasses import dataclass
+from operator import attrgetter
 from typing import List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
 
 from models import (
     Session as RaceSession,
     Result, Penalty, Lap, Driver,
-    BasisEnum, SessionTypeEnum, Point, PointScale, PointAward
+    BasisEnum, SessionTypeEnum, PointAward
 )
 
 from sn28_config import CFG
+from points_config import get_scale
 
 # ---------- Lightweight result view used for preview ----------
 @dataclass
@@ -27,20 +30,17 @@ class ResultView:
 
 # ---------- helpers ----------
 def _latest_provisional_results(db: Session, session_id: int) -> List[Result]:
-    ver_row = (
-        db.query(Result.version)
-          .filter(Result.session_id == session_id, Result.basis == "provisional")
-          .order_by(Result.version.desc())
-          .first()
+    # latest version resolved inside the same SELECT (one round-trip)
+    latest = (
+        select(func.max(Result.version))
+          .where(Result.session_id == session_id, Result.basis == "provisional")
+          .scalar_subquery()
     )
-    if not ver_row:
-        return []
-    v = ver_row[0]
     return (
         db.query(Result)
           .filter(Result.session_id == session_id,
                   Result.basis == "provisional",
-                  Result.version == v)
+                  Result.version == latest)
           .all()
     )
 
@@ -56,34 +56,18 @@ def _copy_to_view(r: Result) -> ResultView:
         status_code=r.status_code,
     )
 
-def _recompute_best_last_after_lap_invalid(db: Session, sess_id: int, driver_id: int, lap_no: int) -> Tuple[Optional[int], Optional[int]]:
+def _recompute_best_last_after_lap_invalid(laps: List[Tuple[int, int]], lap_no: int) -> Tuple[Optional[int], Optional[int]]:
     """
     Mark the given lap invalid and recompute best/last for preview.
     We do NOT persist the lap invalidation here (preview). We compute as-if.
+
+    `laps` is one driver's valid, timed (lap_number, lap_time_ms) rows in lap order.
     """
-    # Pull laps for this driver/session and treat lap_no as invalid
-    laps = (
-        db.query(Lap)
-          .filter(Lap.session_id == sess_id, Lap.driver_id == driver_id)
-          .order_by(Lap.lap_number.asc())
-          .all()
-    )
-    if not laps:
+    times = [time_ms for number, time_ms in laps if number != lap_no]
+    if not times:
         return (None, None)
-
-    best = None
-    last = None
-    for lp in laps:
-        valid = (lp.lap_number != lap_no) and bool(lp.is_valid)
-        if not valid:
-            continue
-        # last = highest numbered valid lap we saw
-        last = lp.lap_time_ms if lp.lap_time_ms is not None else last
-        # best = min valid lap
-        if lp.lap_time_ms is not None:
-            best = lp.lap_time_ms if best is None else min(best, lp.lap_time_ms)
-
-    return (best, last)
+    # best = min valid lap; last = highest numbered valid lap
+    return (min(times), times[-1])
 
 def _apply_penalties_preview(db: Session, sess: RaceSession, views: Dict[int, ResultView]) -> None:
     """
@@ -95,6 +79,32 @@ def _apply_penalties_preview(db: Session, sess: RaceSession, views: Dict[int, Re
           .order_by(Penalty.created_at.asc())
           .all()
     )
+    # Common case: a race with no penalties whose provisional positions are
+    # already exactly 1..N -- sorting and renumbering would change nothing.
+    # (Practice/Qualifying still re-rank by best lap below.)
+    if not pens and sess.session_type in ("Heat", "Prefinal", "Final"):
+        placed = [rv.position for rv in views.values() if rv.position is not None]
+        if set(placed) == set(range(1, len(placed) + 1)):
+            return
+
+    # Valid, timed laps for every driver with a lap invalidation, in one query
+    # rather than one per penalty; the filter matches the partial
+    # ix_laps_valid_best index, so invalid/untimed laps are never read
+    laps_by_driver: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    lap_invalid_drivers = {p.driver_id for p in pens if p.type == "LAP_INVALID" and p.lap_no}
+    if lap_invalid_drivers:
+        lap_rows = (
+            db.query(Lap.driver_id, Lap.lap_number, Lap.lap_time_ms)
+              .filter(Lap.session_id == sess.id,
+                      Lap.driver_id.in_(lap_invalid_drivers),
+                      Lap.is_valid == True,
+                      Lap.lap_time_ms.isnot(None))
+              .order_by(Lap.driver_id, Lap.lap_number)
+              .all()
+        )
+        for driver_id, number, time_ms in lap_rows:
+            laps_by_driver[driver_id].append((number, time_ms))
+
     # Staging for position drops per driver
     pos_drops: Dict[int, int] = {}
     dq_drivers: set[int] = set()
@@ -118,7 +128,7 @@ def _apply_penalties_preview(db: Session, sess: RaceSession, views: Dict[int, Re
             rv.total_time_ms = (rv.total_time_ms or 0) + add_ms
 
         elif p.type == "LAP_INVALID" and p.lap_no:
-            best, last = _recompute_best_last_after_lap_invalid(db, sess.id, p.driver_id, p.lap_no)
+            best, last = _recompute_best_last_after_lap_invalid(laps_by_driver[p.driver_id], p.lap_no)
             rv.best_lap_ms = best
             rv.last_lap_ms = last
 
@@ -132,30 +142,34 @@ def _apply_penalties_preview(db: Session, sess: RaceSession, views: Dict[int, Re
     if sess.session_type in ("Heat", "Prefinal", "Final"):
         # Build a list of race drivers w/ numeric positions, sorted by original finishing order
         race_list = [rv for rv in views.values() if rv.position is not None]
-        race_list.sort(key=lambda r: (r.position if r.position is not None else 10**9,
+        race_list.sort(key=lambda r: (r.position,
                                       r.best_lap_ms if r.best_lap_ms is not None else 10**9))
         
         # Apply position penalties by moving drivers down in the sorted list
         # Process penalties in order of original position to avoid conflicts
-        for driver_id, drop_count in sorted(pos_drops.items(), key=lambda x: next((rv.position for rv in race_list if rv.driver_id == x[0]), 10**9) or 10**9):
+        orig_pos = {rv.driver_id: rv.position for rv in race_list}
+        idx_by_driver = {rv.driver_id: i for i, rv in enumerate(race_list)}
+        for driver_id, drop_count in sorted(pos_drops.items(), key=lambda x: orig_pos.get(x[0], 10**9)):
             if drop_count <= 0:
                 continue
             # Find driver's current index in race_list
-            driver_idx = next((i for i, rv in enumerate(race_list) if rv.driver_id == driver_id), None)
+            driver_idx = idx_by_driver.get(driver_id)
             if driver_idx is not None:
                 # Remove driver from current position
                 driver_rv = race_list.pop(driver_idx)
                 # Insert at new position (bounded by list length)
                 new_idx = min(driver_idx + drop_count, len(race_list))
                 race_list.insert(new_idx, driver_rv)
+                # only the drivers between the two slots changed index
+                for i in range(driver_idx, new_idx + 1):
+                    idx_by_driver[race_list[i].driver_id] = i
         
         # Reassign contiguous positions starting at 1 after all penalties applied
         for i, rv in enumerate(race_list, start=1):
             rv.position = i
 
-        # DQs to the tail, keep status_code
-        dq_list = [rv for rv in views.values() if rv.driver_id in dq_drivers]
-        # They keep None position, UI shows blank; that’s typical
+        # DQs keep their status_code and None position (set above); display
+        # order puts them at the tail, UI shows blank; that’s typical
 
     else:
         # Practice/Qualifying: rank by best lap
@@ -192,10 +206,13 @@ def compute_official_order(db: Session, session_id: int) -> List[ResultView]:
 
     # Final order for display:
     if sess.session_type in ("Heat", "Prefinal", "Final"):
-        # race order: numeric positions first, then non-numeric (DQ) by name
-        numeric = [v for v in views.values() if v.position is not None]
-        tail = [v for v in views.values() if v.position is None]  # DQs etc.
-        numeric.sort(key=lambda r: r.position if r.position is not None else 10**9)
+        # race order: numeric positions first, then non-numeric (DQ) by name;
+        # one pass splits the two groups
+        numeric: List[ResultView] = []
+        tail: List[ResultView] = []  # DQs etc.
+        for v in views.values():
+            (numeric if v.position is not None else tail).append(v)
+        numeric.sort(key=attrgetter("position"))
         tail.sort(key=lambda r: (r.status_code or "", r.driver_id))
         return numeric + tail
     else:
@@ -225,23 +242,20 @@ def write_official_and_award_points(db: Session, session_id: int, scheme_name: s
     )
     next_ver = 1 if not ver_row else (ver_row[0] + 1)
 
-    # 3) persist official results
-    for rv in preview:
-        db.add(Result(
-            session_id=session_id,
-            driver_id=rv.driver_id,
-            basis="official",
-            version=next_ver,
-            position=rv.position,
-            best_lap_ms=rv.best_lap_ms,
-            last_lap_ms=rv.last_lap_ms,
-            total_time_ms=rv.total_time_ms,
-            gap_to_p1_ms=rv.gap_to_p1_ms,
-            status_code=rv.status_code,
-        ))
-
-    # Ensure official results are flushed so queries in this txn can see them
-    db.flush()
+    # 3) persist official results (one executemany)
+    if preview:
+        db.execute(insert(Result), [{
+            "session_id": session_id,
+            "driver_id": rv.driver_id,
+            "basis": "official",
+            "version": next_ver,
+            "position": rv.position,
+            "best_lap_ms": rv.best_lap_ms,
+            "last_lap_ms": rv.last_lap_ms,
+            "total_time_ms": rv.total_time_ms,
+            "gap_to_p1_ms": rv.gap_to_p1_ms,
+            "status_code": rv.status_code,
+        } for rv in preview])
 
     # 4) session status → official
     sess.status = "official"
@@ -290,9 +304,9 @@ def compute_provisional_heat_points(db: Session, session_id: int, scheme_name: O
         # Default to Heat semantics for points if not explicit
         award_type = "Heat"
 
-    # Find point scheme
-    pt = db.query(Point).filter(Point.name == scheme).first()
-    if not pt:
+    # Find point scheme scale (cached per scheme/session type)
+    pos_to_pts = get_scale(db, scheme, award_type)
+    if pos_to_pts is None:
         # attempt lazy seed
         try:
             from points_config import seed_skusa_sn28  # local import
@@ -300,8 +314,8 @@ def compute_provisional_heat_points(db: Session, session_id: int, scheme_name: O
             db.flush()
         except Exception:
             pass
-        pt = db.query(Point).filter(Point.name == scheme).first()
-        if not pt:
+        pos_to_pts = get_scale(db, scheme, award_type)
+        if pos_to_pts is None:
             # cannot compute points without a scheme
             out = []
             for rv in preview:
@@ -316,9 +330,6 @@ def compute_provisional_heat_points(db: Session, session_id: int, scheme_name: O
                 })
             return out
 
-    scales = db.query(PointScale).filter(PointScale.point_id == pt.id, PointScale.session_type == award_type).all()
-    pos_to_pts = {s.position: s.points for s in scales}
-
     out: List[Dict] = []
     for rv in preview:
         if rv.position is None or (rv.status_code == "DQ"):
@@ -346,20 +357,18 @@ def compute_provisional_heat_points(db: Session, session_id: int, scheme_name: O
               .first()
         )
         next_ver = 1 if not ver_row else (ver_row[0] + 1)
-        # Persist PointAward rows for this provisional snapshot
-        for row in out:
-            pa = PointAward(
-                session_id=session_id,
-                driver_id=row["driver_id"],
-                basis="provisional",
-                version=next_ver,
-                position=row["position"],
-                base_points=row["base_points"],
-                bonus_points=row["bonus_points"],
-                total_points=row["total_points"],
-            )
-            db.add(pa)
-        db.flush()
+        # Persist PointAward rows for this provisional snapshot (one executemany)
+        if out:
+            db.execute(insert(PointAward), [{
+                "session_id": session_id,
+                "driver_id": row["driver_id"],
+                "basis": "provisional",
+                "version": next_ver,
+                "position": row["position"],
+                "base_points": row["base_points"],
+                "bonus_points": row["bonus_points"],
+                "total_points": row["total_points"],
+            } for row in out])
 
     return out
 
@@ -370,54 +379,36 @@ def _award_points_for_session(db: Session, sess: RaceSession, preview: List[Resu
       - Assign base points by finisher position; ignore bonus here.
       - Note: Qualifying scales are stored as integers (1..N) to fit schema; when publishing, we can render as 0.01..N*0.01.
     """
-    # find the point scheme
-    pt = (
-        db.query(Point)
-          .filter(Point.name == scheme_name)
-          .first()
-    )
-    if not pt:
+    # position->points for this scheme/session type (cached after first load)
+    pos_to_pts = get_scale(db, scheme_name, award_type)
+    if pos_to_pts is None:
         # Lazy-seed default scheme if missing (first run on a fresh machine)
         try:
-            from points_config import seed_skusa_sn28  # local import to avoid cycles
+            from points_config import seed_skusa_sn28  # local import
             seed_skusa_sn28()
             db.flush()
         except Exception:
             pass
-        pt = (
-            db.query(Point)
-              .filter(Point.name == scheme_name)
-              .first()
-        )
-        if not pt:
+        pos_to_pts = get_scale(db, scheme_name, award_type)
+        if pos_to_pts is None:
             # Still missing: abort awarding silently
             return
 
-    # build a map position->points for this session type
-    scales = (
-        db.query(PointScale)
-          .filter(PointScale.point_id == pt.id,
-                  PointScale.session_type == award_type)
-          .all()
-    )
-    pos_to_pts = {sc.position: sc.points for sc in scales}
-
-    # Use the official results version we just wrote
-    ver = int(version)
-
+    # Award from the preview the caller just wrote as this official version:
+    # same rows, so the cached scale is enough and no read-back is needed.
+    # Positions outside the scale, null positions and DQs score 0.
+    rows = []
     for rv in preview:
-        if rv.position is None or (rv.status_code == "DQ"):
-            pts = 0
-        else:
-            pts = pos_to_pts.get(rv.position, 0)
-
-        db.add(PointAward(
-            session_id=sess.id,
-            driver_id=rv.driver_id,
-            basis="official",
-            version=ver,
-            position=rv.position,
-            base_points=pts,
-            bonus_points=0,
-            total_points=pts
-        ))
+        pts = 0 if rv.status_code == "DQ" else pos_to_pts.get(rv.position, 0)
+        rows.append({
+            "session_id": sess.id,
+            "driver_id": rv.driver_id,
+            "basis": "official",
+            "version": int(version),
+            "position": rv.position,
+            "base_points": pts,
+            "bonus_points": 0,
+            "total_points": pts,
+        })
+    if rows:
+        db.execute(insert(PointAward), rows)
@@ -1,18 +1,61 @@
 # points_config.py
 from __future__ import annotations
 import argparse
-from typing import Dict
-from sqlalchemy import delete
+from typing import Dict, Optional, Tuple
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
 from db import SessionLocal, init_db
 from models import Point, PointScale
 
 SCHEME_NAME = "SKUSA_SN28"
 
+# (scheme name, session type) -> (version, {position: points}). The version
+# is (Point.id, MAX(PointScale.id), COUNT, SUM(points)) of the scheme's rows
+# for that session type, read with one aggregate query on every lookup, so a
+# reseed from another process (`sn28 seed`) or a hand edit is picked up
+# without a restart; only an unchanged version is served from memory.
+_SCALE_CACHE: Dict[Tuple[str, str], Tuple[Tuple[int, ...], Dict[int, int]]] = {}
+
+
+def get_scale(db: Session, scheme_name: str, session_type: str) -> Optional[Dict[int, int]]:
+    """Return {position: points} for one scheme/session type.
+
+    Returns None when the scheme itself is missing (callers lazy-seed then);
+    an existing scheme with no rows for session_type yields an empty dict.
+    """
+    version = db.execute(
+        select(Point.id, func.max(PointScale.id), func.count(PointScale.id), func.sum(PointScale.points))
+          .select_from(Point)
+          .outerjoin(PointScale, and_(PointScale.point_id == Point.id,
+                                      PointScale.session_type == session_type))
+          .where(Point.name == scheme_name)
+          .group_by(Point.id)
+    ).first()
+    if version is None:
+        return None
+    version = tuple(version)
+    key = (scheme_name, session_type)
+    hit = _SCALE_CACHE.get(key)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    rows = (
+        db.query(PointScale.position, PointScale.points)
+          .filter(PointScale.point_id == version[0], PointScale.session_type == session_type)
+          .all()
+    )
+    scale = {position: points for position, points in rows}
+    _SCALE_CACHE[key] = (version, scale)
+    return scale
+
+
+def invalidate_scale_cache() -> None:
+    _SCALE_CACHE.clear()
+
 # SKUSA SuperNats heat scoring: 0 (P1), 2 (P2), 3 (P3), 4 (P4), ..., 120 (P120)
 def build_skusa_heat_scale(field_size: int = 120) -> Dict[int, int]:
+    positions = range(2, field_size + 1)
     scale: Dict[int, int] = {1: 0}
-    for pos in range(2, field_size + 1):
-        scale[pos] = pos  # 2->2, 3->3, 4->4, ...
+    scale.update(zip(positions, positions))  # 2->2, 3->3, 4->4, ...
     return scale
 
 """
@@ -22,10 +65,9 @@ When publishing to Sheets, we render these as fractional hundredths (divide by 1
 so P1 displays as 0.01, P2 as 0.02, ..., P120 as 1.20.
 """
 def build_skusa_qualifying_scale(field_size: int = 120) -> Dict[int, int]:
-    scale: Dict[int, int] = {}
-    for pos in range(1, field_size + 1):
-        scale[pos] = pos  # stored as 1..N; rendered as 0.01..N*0.01 in Sheets
-    return scale
+    positions = range(1, field_size + 1)
+    # stored as 1..N; rendered as 0.01..N*0.01 in Sheets
+    return dict(zip(positions, positions))
 
 def seed_skusa_sn28(field_size: int = 120, bonus_fast_lap: int = 0, bonus_pole: int = 0) -> None:
     init_db()
@@ -56,13 +98,10 @@ def seed_skusa_sn28(field_size: int = 120, bonus_fast_lap: int = 0, bonus_pole:
             )
         )
         heat_scale = build_skusa_heat_scale(field_size)
-        for position, points in sorted(heat_scale.items()):
-            db.add(PointScale(
-                point_id=pt.id,
-                session_type="Heat",
-                position=position,
-                points=points
-            ))
+        db.execute(insert(PointScale), [
+            {"point_id": pt.id, "session_type": "Heat", "position": position, "points": points}
+            for position, points in sorted(heat_scale.items())
+        ])
 
         # Replace all Qualifying scales for this scheme
         db.execute(
@@ -72,15 +111,13 @@ def seed_skusa_sn28(field_size: int = 120, bonus_fast_lap: int = 0, bonus_pole:
             )
         )
         qual_scale = build_skusa_qualifying_scale(field_size)
-        for position, points in sorted(qual_scale.items()):
-            db.add(PointScale(
-                point_id=pt.id,
-                session_type="Qualifying",
-                position=position,
-                points=points
-            ))
+        db.execute(insert(PointScale), [
+            {"point_id": pt.id, "session_type": "Qualifying", "position": position, "points": points}
+            for position, points in sorted(qual_scale.items())
+        ])
 
         db.commit()
+    invalidate_scale_cache()
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="Seed SKUSA SuperNats 28 Heat and Qualifying points")
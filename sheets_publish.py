@@ -1,23 +1,33 @@
 # sheets_publish.py
+#
+# Rule for publishers: read everything from the DB into plain values (dicts,
+# lists, strings) inside the `with SessionLocal() as db:` block and make the
+# Sheets calls after it. A Sheets round-trip takes seconds; made inside the
+# block it would keep the session's connection checked out for all of it.
 from __future__ import annotations
-from typing import List, Dict, Tuple, Optional, Any
-from datetime import datetime
+from typing import List, Dict, Tuple, Optional, Any, Iterable, Mapping, Sequence
+from datetime import datetime, timezone
+from itertools import chain
+from dataclasses import dataclass
 import json
 import os
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import gspread
 from google.oauth2.service_account import Credentials
-from sqlalchemy import func, and_
+from sqlalchemy import and_, func, select
 
 from sn28_config import CFG
 from db import SessionLocal
 from models import (
     Session as RaceSession,
-    Result, Driver, Entry,
-    PointAward, Point, PointScale,
+    RaceClass, Result, Driver, Entry,
+    PointAward,
 )
 from official import compute_provisional_heat_points, compute_official_order
+from points_config import get_scale
 from sn28_config import CFG
 
 # =========================
@@ -34,11 +44,29 @@ def _load_creds() -> Credentials:
         return Credentials.from_service_account_file(CFG.google.service_json_path, scopes=_SCOPES)
     raise RuntimeError("Google service account credentials not found. Set GS_SERVICE_JSON_PATH or GS_SERVICE_JSON_RAW.")
 
+# Opened spreadsheet, keyed by the config it was opened with. The gspread
+# client refreshes its access token by itself, so the handle stays usable.
+_sheet_cache: Dict[Tuple[Any, ...], Any] = {}
+_sheet_cache_lock = threading.Lock()
+
+# Caps the Sheets write calls in flight when publishers run side by side
+# (publish_all); keeps a burst inside the per-user write quota.
+_SHEETS_WRITE_SEMA = threading.BoundedSemaphore(4)
+
 def _open_sheet():
-    gc = gspread.authorize(_load_creds())
-    if not CFG.google.spreadsheet_id:
-        raise RuntimeError("Google spreadsheet_id not configured. Set GS_SPREADSHEET_ID.")
-    return gc.open_by_key(CFG.google.spreadsheet_id)
+    """Authorize and open the configured spreadsheet once per process."""
+    key = (CFG.google.spreadsheet_id, CFG.google.service_json_path, CFG.google.service_json_raw)
+    with _sheet_cache_lock:
+        sh = _sheet_cache.get(key)
+        if sh is None:
+            gc = gspread.authorize(_load_creds())
+            if not CFG.google.spreadsheet_id:
+                raise RuntimeError("Google spreadsheet_id not configured. Set GS_SPREADSHEET_ID.")
+            sh = gc.open_by_key(CFG.google.spreadsheet_id)
+            # settings changed: drop the handle for the old sheet/credentials
+            _sheet_cache.clear()
+            _sheet_cache[key] = sh
+        return sh
 
 def _safe_ws(sh, title: str, rows: int = 500, cols: int = 16):
     try:
@@ -46,39 +74,165 @@ def _safe_ws(sh, title: str, rows: int = 500, cols: int = 16):
     except gspread.WorksheetNotFound:
         return sh.add_worksheet(title=title, rows=rows, cols=cols)
 
+def _ensure_tabs(sh, tabs: List[Tuple[str, int, int]]) -> List[str]:
+    """
+    Make sure every (title, rows, cols) tab exists: one metadata read for the
+    existing titles and one batchUpdate with an addSheet per missing tab,
+    instead of a worksheet lookup (and maybe an add) per tab. Returns the
+    titles it added; those are known blank, so _batch_replace can write them
+    without a clear.
+    """
+    existing = {ws.title for ws in sh.worksheets()}
+    missing = [(title, rows, cols) for title, rows, cols in tabs if title not in existing]
+    if not missing:
+        return []
+    sh.batch_update({"requests": [
+        {"addSheet": {"properties": {
+            "title": title,
+            "gridProperties": {"rowCount": rows, "columnCount": cols},
+        }}}
+        for title, rows, cols in missing
+    ]})
+    return [title for title, _, _ in missing]
+
 # =========================
 # SHEETS HELPER: single fast write
 # =========================
-def _publish_rows(sh, tab_title: str, header: List[str], rows: List[List[Any]]) -> None:
+def _raw_cell(value: Any) -> Dict[str, Any]:
+    """CellData for one RAW value (no parsing, same as valueInputOption=RAW)."""
+    if value is None:
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+def _publish_rows(sh, tab_title: str, header: List[str], rows: Iterable[Sequence[Any]]) -> None:
     """
-    Writes header + rows to a 'Raw_' tab in a single batch_update.
-    Ensures the sheet exists and is sized to fit the data. Overwrites A1:... block only.
+    Writes header + rows to a 'Raw_' tab in a single spreadsheet batchUpdate.
+    Ensures the sheet exists and is sized to fit the data: a new tab is created
+    at the data size, an existing one only grows (in the same request) when
+    the data no longer fits. The old values are cleared and the new block
+    written from A1 in the same request.
     """
-    ws = _safe_ws(sh, tab_title, rows=max(1000, len(rows) + 10), cols=max(16, len(header) + 4))
-
-    # Compute write range based on header length and row count
-    total_rows = 1 + len(rows)
-    total_cols = max(len(header), max((len(r) for r in rows), default=0))
-    import gspread
-    end_col_letter = gspread.utils.rowcol_to_a1(1, total_cols).split('1')[0]  # e.g. 'S' from 'S1'
-    # Include sheet title in range to target the correct worksheet
-    write_range = f"'{tab_title}'!A1:{end_col_letter}{total_rows}"
+    _publish_tables(sh, [(tab_title, header, rows)])
 
-    values = [header] + rows
-
-    body = {
-        "valueInputOption": "RAW",
-        "data": [
+def _publish_tables(sh, tables: Sequence[Tuple[str, List[str], Iterable[Sequence[Any]]]],
+                    worksheets: Optional[Iterable[Any]] = None) -> None:
+    """
+    _publish_rows for several (tab_title, header, rows) tabs in one batchUpdate.
+    rows may be any iterable (e.g. a generator): it is turned straight into
+    CellData rows, with no intermediate header + rows copy.
+    The existing tabs come from one metadata read; missing ones are added by
+    addSheet requests (with a chosen sheetId) at the head of the same
+    batchUpdate, so the whole set costs one read and one write. A caller that
+    already has the tab list (sh.worksheets()) can pass it as worksheets.
+    """
+    if worksheets is None:
+        worksheets = sh.worksheets()
+    existing = {ws.title: ws for ws in worksheets}
+    next_id = max((ws.id for ws in existing.values()), default=0) + 1
+    requests: List[Dict[str, Any]] = []
+    adds: List[Dict[str, Any]] = []
+    for tab_title, header, rows in tables:
+        cell_rows = [{"values": [_raw_cell(v) for v in row]} for row in chain((header,), rows)]
+        need_rows = len(cell_rows) + 10
+        need_cols = max((len(r["values"]) for r in cell_rows), default=0)
+        ws = existing.get(tab_title)
+        if ws is None:
+            # new tab, created at the data size
+            sheet_id = next_id
+            next_id += 1
+            adds.append({"addSheet": {"properties": {
+                "sheetId": sheet_id,
+                "title": tab_title,
+                "gridProperties": {"rowCount": need_rows, "columnCount": max(need_cols, 1)},
+            }}})
+        else:
+            sheet_id = ws.id
+            # grow only: the grid size is in the worksheet properties, no extra read
+            if ws.row_count < len(cell_rows) or ws.col_count < need_cols:
+                requests.append({
+                    "updateSheetProperties": {
+                        "properties": {
+                            "sheetId": sheet_id,
+                            "gridProperties": {
+                                "rowCount": max(ws.row_count, need_rows),
+                                "columnCount": max(ws.col_count, need_cols),
+                            },
+                        },
+                        "fields": "gridProperties(rowCount,columnCount)",
+                    }
+                })
+
+        requests += [
+            # Clear every value on the tab (formats stay, like ws.clear())
+            {"updateCells": {"range": {"sheetId": sheet_id}, "fields": "userEnteredValue"}},
             {
-                "range": write_range,
-                "values": values,
-            }
+                "updateCells": {
+                    "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0},
+                    "rows": cell_rows,
+                    "fields": "userEnteredValue",
+                }
+            },
         ]
-    }
 
-    # Clear only the previous used area (to avoid old tail data showing)
-    ws.clear()
-    ws.spreadsheet.values_batch_update(body)
+    # one HTTP round-trip instead of a values clear followed by a values write
+    with _SHEETS_WRITE_SEMA:
+        sh.batch_update({"requests": adds + requests})
+
+# characters Sheets does not allow in a tab title, as a str.translate deletion table
+_BAD_TITLE_CHARS = str.maketrans("", "", ":/\\?*[]")
+
+def _sanitize_title(title: str) -> str:
+    """Drop characters Sheets rejects in tab titles and cap the length."""
+    return title.translate(_BAD_TITLE_CHARS)[:95]
+
+def _a1_tab(title: str) -> str:
+    """Quote a tab title for use in an A1 range."""
+    return "'" + title.replace("'", "''") + "'"
+
+def _values_extent(values: List[List[Any]]) -> Tuple[int, int]:
+    """(rows, cols) covered by a block of values, e.g. what ws.get_all_values() returned."""
+    return len(values), max((len(row) for row in values), default=0)
+
+def _batch_replace(sh, writes: List[Tuple[str, List[List[Any]]]],
+                   known_extents: Optional[Mapping[str, Tuple[int, int]]] = None) -> None:
+    """
+    Replace the values of one or more tabs, parsed as USER_ENTERED (formulas).
+    Each (tab_title, values) is written from A1 in one values.batchUpdate for
+    all tabs. known_extents maps titles to the (rows, cols) the tab holds right
+    now, as the caller just read it (or (0, 0) for a tab it just created);
+    such a tab is overwritten with the new block padded by blank cells out to
+    that extent and needs no clear. Every other tab gets a values.batchClear
+    first: another process or a person may have written to it.
+    """
+    if not writes:
+        return
+    known_extents = known_extents or {}
+
+    to_clear: List[str] = []
+    data: List[Dict[str, Any]] = []
+    for title, values in writes:
+        old = known_extents.get(title)
+        if old is None:
+            to_clear.append(title)
+        else:
+            n_rows, n_cols = _values_extent(values)
+            old_rows, old_cols = old
+            if old_rows > n_rows or old_cols > n_cols:
+                width = max(old_cols, n_cols)
+                values = [list(row) + [""] * (width - len(row)) for row in values]
+                values += [[""] * width for _ in range(old_rows - n_rows)]
+        if values:
+            data.append({"range": f"{_a1_tab(title)}!A1", "values": values})
+
+    with _SHEETS_WRITE_SEMA:
+        if to_clear:
+            sh.values_batch_clear(body={"ranges": [_a1_tab(title) for title in to_clear]})
+        if data:
+            sh.values_batch_update({"valueInputOption": "USER_ENTERED", "data": data})
 
 # =========================
 # DB helpers
@@ -93,6 +247,134 @@ def _latest_version(db, session_id: int, basis: str) -> Optional[int]:
     )
     return row[0] if row else None
 
+def _number_map(db, event_id: int, class_id: int) -> Dict[int, str]:
+    """Return {driver_id: kart number} for one event/class.
+
+    Memoized in the DB session's info dict, so every fetcher in one publish
+    shares a single Entry query and nothing outlives that session.
+    """
+    key = ("num_by_driver", event_id, class_id)
+    nums = db.info.get(key)
+    if nums is None:
+        nums = dict(
+            db.query(Entry.driver_id, func.coalesce(Entry.number, ""))
+              .filter(Entry.event_id == event_id, Entry.class_id == class_id)
+              .all()
+        )
+        db.info[key] = nums
+    return nums
+
+def _latest_version_subq(session_id: int, basis: str):
+    """Scalar subquery for the latest Result version, to filter in the same SELECT."""
+    return (
+        select(func.max(Result.version))
+          .where(Result.session_id == session_id, Result.basis == basis)
+          .scalar_subquery()
+    )
+
+def _class_name(db, event_id: int, class_id: int) -> Optional[str]:
+    """Name of the class, when it has a session in the event (one joined SELECT)."""
+    return (
+        db.query(RaceClass.name)
+          .join(RaceSession, RaceSession.class_id == RaceClass.id)
+          .filter(RaceSession.class_id == class_id, RaceSession.event_id == event_id)
+          .limit(1)
+          .scalar()
+    )
+
+def _class_names(db, event_id: int) -> Dict[int, str]:
+    """Return {class_id: class name} for every class with a session in the event."""
+    rows = (
+        db.query(RaceSession.class_id, RaceClass.name)
+          .join(RaceClass, RaceClass.id == RaceSession.class_id)
+          .filter(RaceSession.event_id == event_id)
+          .distinct()
+          .all()
+    )
+    return {cid: name for cid, name in rows if name}
+
+def _latest_official_awards(session_ids: List[int]):
+    """
+    Subquery of the PointAwards in each session's latest official version.
+    RANK() rather than ROW_NUMBER(): every driver row of the top version
+    shares rank 1, so the whole version survives the rn == 1 filter.
+    """
+    ranked = (
+        select(PointAward.session_id, PointAward.driver_id, PointAward.total_points,
+               func.rank().over(partition_by=PointAward.session_id,
+                                order_by=PointAward.version.desc()).label("rn"))
+          .where(PointAward.session_id.in_(session_ids), PointAward.basis == "official")
+          .subquery()
+    )
+    return select(ranked).where(ranked.c.rn == 1).subquery()
+
+def _latest_official_results(session_ids: List[int]):
+    """Subquery of the Results in each session's latest official version (see _latest_official_awards)."""
+    ranked = (
+        select(Result.session_id, Result.driver_id, Result.position,
+               func.rank().over(partition_by=Result.session_id,
+                                order_by=Result.version.desc()).label("rn"))
+          .where(Result.session_id.in_(session_ids), Result.basis == "official")
+          .subquery()
+    )
+    return select(ranked).where(ranked.c.rn == 1).subquery()
+
+def _class_session_ids(db, event_id: int, class_id: int) -> Tuple[List[int], List[int]]:
+    """Return (heat session ids, qualifying session ids) of a class, in one SELECT."""
+    heat_ids: List[int] = []
+    q_ids: List[int] = []
+    rows = (
+        db.query(RaceSession.id, RaceSession.session_type)
+          .filter(RaceSession.event_id == event_id,
+                  RaceSession.class_id == class_id,
+                  RaceSession.session_type.in_(("Heat", "Qualifying")))
+          .all()
+    )
+    for sid, stype in rows:
+        (heat_ids if stype == "Heat" else q_ids).append(sid)
+    return heat_ids, q_ids
+
+def _heat_point_totals(db, heat_ids: List[int]) -> Tuple[Dict[int, int], Dict[int, str]]:
+    """
+    Sum each driver's latest official PointAwards over the given heats.
+    Returns ({driver_id: total points}, {driver_id: "First Last"}); the SUM
+    and the joins run in SQL, one row per driver comes back.
+    """
+    latest = _latest_official_awards(heat_ids)
+    rows = (
+        db.query(Driver.id, Driver.first_name, Driver.last_name,
+                 func.coalesce(func.sum(latest.c.total_points), 0).label("tot"))
+          .join(latest, latest.c.driver_id == Driver.id)
+          .group_by(Driver.id)
+          .all()
+    )
+    agg = {drv_id: tot for drv_id, _, _, tot in rows}
+    name_by_driver = {drv_id: f"{first} {last}".strip() for drv_id, first, last, _ in rows}
+    return agg, name_by_driver
+
+def _official_point_sums(db, session_ids: List[int]) -> Dict[int, int]:
+    """Return {driver_id: summed total_points} over the latest official PointAwards of the sessions."""
+    if not session_ids:
+        return {}
+    latest = _latest_official_awards(session_ids)
+    return dict(
+        db.query(latest.c.driver_id, func.coalesce(func.sum(latest.c.total_points), 0))
+          .group_by(latest.c.driver_id)
+          .all()
+    )
+
+def _qual_best_positions(db, q_ids: List[int]) -> Dict[int, int]:
+    """Return {driver_id: best position} over the latest official Results of the given qualifying sessions."""
+    if not q_ids:
+        return {}
+    latest = _latest_official_results(q_ids)
+    return dict(
+        db.query(latest.c.driver_id, func.min(latest.c.position))
+          .filter(latest.c.position.isnot(None))
+          .group_by(latest.c.driver_id)
+          .all()
+    )
+
 def _get_session(db, session_id: int) -> RaceSession:
     s = db.get(RaceSession, session_id)
     if not s:
@@ -100,93 +382,75 @@ def _get_session(db, session_id: int) -> RaceSession:
     return s
 
 def _ms(ms: Optional[int]) -> str:
+    # integer divmod + int formatting: no float division or float rounding
     if ms is None:
         return ""
-    s = ms / 1000.0
-    if s >= 60:
-        m = int(s // 60)
-        return f"{m}:{(s - 60*m):06.3f}"
-    return f"{s:.3f}"
+    if ms < 60000:
+        sign = "-" if ms < 0 else ""
+        sec, milli = divmod(abs(ms), 1000)
+        return f"{sign}{sec}.{milli:03d}"
+    m, rem = divmod(ms, 60000)
+    sec, milli = divmod(rem, 1000)
+    return f"{m}:{sec:02d}.{milli:03d}"
 
 # =========================
 # Fetchers
 # =========================
 
-def _fetch_official_results(db, session_id: int) -> List[Dict]:
-    v = _latest_version(db, session_id, "official")
-    if v is None:
-        return []
+def _fetch_official_results(db, session_id: int) -> Sequence[Mapping[str, Any]]:
     sess = _get_session(db, session_id)
 
-    # Preload numbers for (event_id, class_id)
-    num_by_driver: Dict[int, str] = {}
-    for e in (
-        db.query(Entry)
-          .filter(Entry.event_id == sess.event_id, Entry.class_id == sess.class_id)
-          .all()
-    ):
-        num_by_driver[e.driver_id] = e.number or ""
-
-    q = (
-        db.query(Result, Driver)
+    # Rows come back as mappings keyed by the labels below, with the kart
+    # number, "First Last" and blank-for-NULL defaults resolved in SQL, so
+    # there's no per-row dict or string building here. One Entry per driver
+    # per event/class (uq_entry_event_class_driver), so the outer join can't
+    # fan out.
+    stmt = (
+        select(Driver.id.label("driver_id"),
+               Result.position.label("pos"),
+               func.coalesce(Entry.number, "").label("number"),
+               Driver.first_name.label("first"),
+               Driver.last_name.label("last"),
+               func.trim(Driver.first_name + " " + Driver.last_name).label("full_name"),
+               func.coalesce(Driver.team, "").label("team"),
+               func.coalesce(Driver.chassis, "").label("chassis"),
+               Result.best_lap_ms.label("best_ms"),
+               Result.last_lap_ms.label("last_ms"),
+               func.coalesce(Result.status_code, "").label("status"))
           .join(Driver, Driver.id == Result.driver_id)
-          .filter(Result.session_id == session_id,
-                  Result.basis == "official",
-                  Result.version == v)
+          .outerjoin(Entry, and_(Entry.driver_id == Result.driver_id,
+                                 Entry.event_id == sess.event_id,
+                                 Entry.class_id == sess.class_id))
+          .where(Result.session_id == session_id,
+                 Result.basis == "official",
+                 Result.version == _latest_version_subq(session_id, "official"))
           .order_by(Result.position.is_(None), Result.position.asc())
     )
-    out: List[Dict] = []
-    for r, d in q.all():
-        out.append({
-            "driver_id": d.id,
-            "pos": r.position,
-            "number": num_by_driver.get(d.id, ""),
-            "first": d.first_name,
-            "last": d.last_name,
-            "team": d.team or "",
-            "chassis": d.chassis or "",
-            "best_ms": r.best_lap_ms,
-            "last_ms": r.last_lap_ms,
-            "status": r.status_code or "",
-        })
-    return out
-
-def _fetch_heat_points(db, session_id: int) -> List[Dict]:
-    v = _latest_version(db, session_id, "official")
-    if v is None:
-        return []
-    sess = _get_session(db, session_id)
+    return db.execute(stmt).mappings().all()
 
-    # Preload numbers for (event_id, class_id)
-    num_by_driver: Dict[int, str] = {}
-    for e in (
-        db.query(Entry)
-          .filter(Entry.event_id == sess.event_id, Entry.class_id == sess.class_id)
-          .all()
-    ):
-        num_by_driver[e.driver_id] = e.number or ""
+def _fetch_heat_points(db, session_id: int) -> Sequence[Mapping[str, Any]]:
+    sess = _get_session(db, session_id)
 
-    qa = (
-        db.query(PointAward, Driver)
+    stmt = (
+        select(Driver.id.label("driver_id"),
+               PointAward.position.label("pos"),
+               func.coalesce(Entry.number, "").label("number"),
+               Driver.first_name.label("first"),
+               Driver.last_name.label("last"),
+               func.trim(Driver.first_name + " " + Driver.last_name).label("full_name"),
+               func.coalesce(PointAward.base_points, 0).label("base"),
+               func.coalesce(PointAward.bonus_points, 0).label("bonus"),
+               func.coalesce(PointAward.total_points, 0).label("total"))
           .join(Driver, Driver.id == PointAward.driver_id)
-          .filter(PointAward.session_id == session_id,
-                  PointAward.basis == "official",
-                  PointAward.version == v)
+          .outerjoin(Entry, and_(Entry.driver_id == PointAward.driver_id,
+                                 Entry.event_id == sess.event_id,
+                                 Entry.class_id == sess.class_id))
+          .where(PointAward.session_id == session_id,
+                 PointAward.basis == "official",
+                 PointAward.version == _latest_version_subq(session_id, "official"))
           .order_by(PointAward.position.is_(None), PointAward.position.asc())
     )
-    out: List[Dict] = []
-    for pa, d in qa.all():
-        out.append({
-            "driver_id": d.id,
-            "pos": pa.position,
-            "number": num_by_driver.get(d.id, ""),
-            "first": d.first_name,
-            "last": d.last_name,
-            "base": pa.base_points or 0,
-            "bonus": pa.bonus_points or 0,
-            "total": pa.total_points or 0,
-        })
-    return out
+    return db.execute(stmt).mappings().all()
 
 # =========================
 # Publishers
@@ -203,31 +467,34 @@ def publish_official_results(session_id: int) -> None:
         data = _fetch_official_results(db, session_id)
 
     header = ["Class", "Session", "Pos", "#", "Driver", "Team", "Chassis", "Best Lap", "Last Lap", "Status", "Updated"]
-    rows = [header]
-    for row in data:
-        rows.append([
-            getattr(sess.race_class, "name", "") if sess else "",
-            f"{sess.session_type} - {sess.session_name or ''}" if sess else "",
+    session_label = f"{sess.session_type} - {sess.session_name or ''}" if sess else ""
+    class_name = getattr(sess.race_class, "name", "") if sess else ""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [header, *(
+        [
+            class_name,
+            session_label,
             row["pos"] or "",
             row["number"],
-            f'{row["first"]} {row["last"]}'.strip(),
+            row["full_name"],
             row["team"],
             row["chassis"],
             _ms(row["best_ms"]),
             _ms(row["last_ms"]),
             row["status"],
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        ])
+            now,
+        ]
+        for row in data
+    )]
 
     # Merge: preserve other sessions/classes in this tab. Replace rows that match
     # this class+session, append otherwise.
     try:
         existing = ws.get_all_values()
+        known = {ws.title: _values_extent(existing)}
     except Exception:
         existing = []
-
-    session_label = f"{sess.session_type} - {sess.session_name or ''}" if sess else ""
-    class_name = getattr(sess.race_class, "name", "") if sess else ""
+        known = None
 
     new_body: List[List[Any]] = []
     if existing:
@@ -249,8 +516,7 @@ def publish_official_results(session_id: int) -> None:
         new_body.append(r)
 
     if new_body:
-        ws.clear()
-        ws.update(range_name="A1", values=new_body, value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+        _batch_replace(sh, [(ws.title, new_body)], known)
 
 def publish_heat_points(session_id: int) -> None:
     if not CFG.app.publish_points:
@@ -263,23 +529,25 @@ def publish_heat_points(session_id: int) -> None:
         data = _fetch_heat_points(db, session_id)
 
     header = ["Class", "Heat", "Pos", "#", "Driver", "Base", "Bonus", "Total", "Updated"]
-    rows = [header]
-    for row in data:
-        rows.append([
-            getattr(sess.race_class, "name", "") if sess else "",
-            sess.session_name or "",
+    class_name = getattr(sess.race_class, "name", "") if sess else ""
+    heat_name = sess.session_name or ""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [header, *(
+        [
+            class_name,
+            heat_name,
             row["pos"] or "",
             row["number"],
-            f'{row["first"]} {row["last"]}'.strip(),
+            row["full_name"],
             row["base"],
             row["bonus"],
             row["total"],
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        ])
+            now,
+        ]
+        for row in data
+    )]
 
-    ws.clear()
-    if rows:
-        ws.update(range_name="A1", values=rows, value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+    _batch_replace(sh, [(ws.title, rows)])
 
 
 def publish_live_heat_points(session_id: int) -> None:
@@ -300,7 +568,10 @@ def publish_live_heat_points(session_id: int) -> None:
 
         class_name = getattr(sess.race_class, "name", "") if sess else ""
         ver = None
-        now_utc = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+        num_by_driver = _number_map(db, sess.event_id, sess.class_id)
+
+        now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
         header = [
             "EventID","ClassID","Class","SessionID","SessionType","SessionName",
@@ -342,23 +613,16 @@ def publish_live_heat_points(session_id: int) -> None:
             merged_list = [v for v in merged_views.values() if v.get("status_code") != "DQ"]
             merged_list.sort(key=lambda r: r.get("best_lap_ms_norm", 10**9))
 
+            # qualifying scale (stored as 1..N in DB); empty if the scheme is missing
+            qual_scale = get_scale(db, CFG.app.points_scheme, "Qualifying") or {}
+
             # assign positions
             for i, mv in enumerate(merged_list, start=1):
                 driver = db.get(Driver, mv["driver_id"]) if mv.get("driver_id") else None
-                number = ""
-                if driver and sess:
-                    for e in driver.entries:
-                        if e.event_id == sess.event_id and e.class_id == sess.class_id:
-                            number = e.number or ""
-                            break
+                number = num_by_driver.get(driver.id, "") if driver else ""
 
                 # compute base points using qualifying scale (stored as 1..N in DB)
-                pt = db.query(Point).filter(Point.name == CFG.app.points_scheme).first()
-                if not pt:
-                    base_int = 0
-                else:
-                    scale = db.query(PointScale).filter(PointScale.point_id == pt.id, PointScale.session_type == "Qualifying", PointScale.position == i).first()
-                    base_int = int(scale.points) if scale and scale.points is not None else 0
+                base_int = int(qual_scale.get(i) or 0)
 
                 # include previously awarded official points for other sessions (exclude merged sids)
                 prev_points = int(db.query(func.coalesce(func.sum(PointAward.total_points), 0))
@@ -410,12 +674,7 @@ def publish_live_heat_points(session_id: int) -> None:
 
             for r in prov:
                 driver = db.get(Driver, r["driver_id"]) if r.get("driver_id") else None
-                number = ""
-                if driver and sess:
-                    for e in driver.entries:
-                        if e.event_id == sess.event_id and e.class_id == sess.class_id:
-                            number = e.number or ""
-                            break
+                number = num_by_driver.get(driver.id, "") if driver else ""
                 pos = r.get("position")
                 session_total = int(r.get("total_points", 0) or 0)
 
@@ -486,8 +745,10 @@ def publish_live_heat_points(session_id: int) -> None:
     # Merge/update: keep existing rows not matching this session+class, replace matching ones
     try:
         existing = ws.get_all_values()
+        known = {ws.title: _values_extent(existing)}
     except Exception:
         existing = []
+        known = None
 
     # If the sheet contains rows for a different session, assume a new session
     # has started and clear the tab before writing the fresh session's rows.
@@ -501,10 +762,7 @@ def publish_live_heat_points(session_id: int) -> None:
 
     # If other sessions are present, clear and write only our header+rows
     if other_session_present:
-        ws.clear()
-        payload = [header] + rows
-        if payload:
-            ws.update(range_name="A1", values=payload, value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+        _batch_replace(sh, [(ws.title, [header] + rows)], known)
         return
 
     # Otherwise merge/update: keep existing rows not matching this session+class, replace matching ones
@@ -529,8 +787,7 @@ def publish_live_heat_points(session_id: int) -> None:
         new_body.append(r)
 
     if new_body:
-        ws.clear()
-        ws.update(range_name="A1", values=new_body, value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+        _batch_replace(sh, [(ws.title, new_body)], known)
 
 def publish_prefinal_grid(class_id: int, event_id: int) -> None:
     """
@@ -543,107 +800,31 @@ def publish_prefinal_grid(class_id: int, event_id: int) -> None:
     ws = _safe_ws(sh, CFG.google.tab_prefinal_grid, rows=1000, cols=12)
 
     with SessionLocal() as db:
-        # 1) Heat session IDs
-        heat_ids = [
-            sid for (sid,) in db.query(RaceSession.id)
-                                 .filter(RaceSession.event_id == event_id,
-                                         RaceSession.class_id == class_id,
-                                         RaceSession.session_type == "Heat")
-                                 .all()
-        ]
-        if not heat_ids:
-            ws.clear()
-            ws.update(range_name="A1", values=[["No Heat sessions found for this class/event."]])
-            return
+        # Heat points summed per driver, ranked with the qualifying tiebreak
+        st = _compute_class_standings(db, class_id, event_id)
 
-        # 2) For each heat, use latest official PointAwards
-        sub_latest = (
-            db.query(PointAward.session_id, func.max(PointAward.version).label("v"))
-              .filter(PointAward.session_id.in_(heat_ids), PointAward.basis == "official")
-              .group_by(PointAward.session_id)
-              .subquery()
-        )
-
-        qa = (
-            db.query(PointAward, Driver)
-              .join(Driver, Driver.id == PointAward.driver_id)
-              .join(sub_latest, (PointAward.session_id == sub_latest.c.session_id) &
-                               (PointAward.version == sub_latest.c.v))
-              .all()
-        )
+    if not st.heat_ids:
+        _batch_replace(sh, [(ws.title, [["No Heat sessions found for this class/event."]])])
+        return
 
-        # 3) Aggregate points by driver
-        agg: Dict[int, int] = {}
-        name_by_driver: Dict[int, str] = {}
-        num_by_driver: Dict[int, str] = {}
-        # preload numbers for class/event
-        for e in db.query(Entry).filter(Entry.event_id == event_id,
-                                        Entry.class_id == class_id).all():
-            num_by_driver[e.driver_id] = e.number or ""
-
-        for pa, d in qa:
-            agg[d.id] = agg.get(d.id, 0) + (pa.total_points or 0)
-            name_by_driver[d.id] = f"{d.first_name} {d.last_name}".strip()
-
-        # 4) Qualifying tiebreak: best official qualifying position
-        q_ids = [
-            sid for (sid,) in db.query(RaceSession.id)
-                                 .filter(RaceSession.event_id == event_id,
-                                         RaceSession.class_id == class_id,
-                                         RaceSession.session_type == "Qualifying")
-                                 .all()
+    # Write rows
+    header = ["Class", "Grid Pos", "#", "Driver", "Total Heat Pts", "Qual Tiebreak", "Updated"]
+    class_name = st.class_name or ""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [header, *(
+        [
+            class_name,
+            str(i),
+            st.num_by_driver.get(drv_id, ""),
+            st.name_by_driver.get(drv_id, ""),
+            str(st.agg.get(drv_id, 0)),
+            str(st.qual_best_pos.get(drv_id, "")),
+            now,
         ]
-        qual_best_pos: Dict[int, int] = {}
-        if q_ids:
-            sub_latest_q = (
-                db.query(Result.session_id, func.max(Result.version).label("v"))
-                  .filter(Result.session_id.in_(q_ids), Result.basis == "official")
-                  .group_by(Result.session_id)
-                  .subquery()
-            )
-            qres = (
-                db.query(Result)
-                  .join(sub_latest_q, (Result.session_id == sub_latest_q.c.session_id) &
-                                     (Result.version == sub_latest_q.c.v))
-                  .filter(Result.position.isnot(None))
-                  .all()
-            )
-            for r in qres:
-                cur = qual_best_pos.get(r.driver_id)
-                if cur is None or (r.position or 10**6) < cur:
-                    qual_best_pos[r.driver_id] = r.position or cur or 10**6
-
-        # 5) Rank: lower points wins; tie -> better qual pos; then name
-        def key_fn(drv_id: int):
-            return (agg.get(drv_id, 10**6),
-                    qual_best_pos.get(drv_id, 10**6),
-                    name_by_driver.get(drv_id, ""))
-
-        ranked = sorted(agg.keys(), key=key_fn)
-
-        # 6) Write rows
-        header = ["Class", "Grid Pos", "#", "Driver", "Total Heat Pts", "Qual Tiebreak", "Updated"]
-        rows = [header]
-        class_name = (db.query(RaceSession)
-                        .filter(RaceSession.class_id == class_id,
-                                RaceSession.event_id == event_id)
-                        .first())
-        class_name = class_name.race_class.name if class_name and class_name.race_class else ""
-
-        for i, drv_id in enumerate(ranked, start=1):
-            rows.append([
-                class_name,
-                str(i),
-                num_by_driver.get(drv_id, ""),
-                name_by_driver.get(drv_id, ""),
-                str(agg.get(drv_id, 0)),
-                str(qual_best_pos.get(drv_id, "")),
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            ])
+        for i, drv_id in enumerate(st.ranked, start=1)
+    )]
 
-    ws.clear()
-    if rows:
-        ws.update(range_name="A1", values=rows, value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+    _batch_replace(sh, [(ws.title, rows)])
 
 # =========================
 # Raw publishers for normalized Google Sheets tabs
@@ -669,21 +850,27 @@ def publish_raw_results(session_id: int) -> None:
         ]
 
         ver = _latest_version(db, session_id, "official") or 0
-        now_utc = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
-        rows: List[List[Any]] = []
-        for row in data:
-            driver_id = row.get("driver_id") if "driver_id" in row else None
-            rows.append([
-                sess.event_id if sess else None,
-                sess.class_id if sess else None,
+        now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+        # session columns are the same on every row: read the ORM attributes once
+        event_id = sess.event_id if sess else None
+        class_id = sess.class_id if sess else None
+        s_id = sess.id if sess else None
+        s_type = sess.session_type if sess else ""
+        s_name = (sess.session_name or "") if sess else ""
+
+        # generator: _publish_rows turns each row into CellData as it goes
+        rows = (
+            [
+                event_id,
+                class_id,
                 class_name,
-                sess.id if sess else None,
-                sess.session_type if sess else "",
-                (sess.session_name or "") if sess else "",
+                s_id,
+                s_type,
+                s_name,
                 ver,
                 "official",
-                driver_id,
+                row.get("driver_id"),
                 row["pos"],
                 row["number"],
                 row["first"],
@@ -694,37 +881,60 @@ def publish_raw_results(session_id: int) -> None:
                 row["last_ms"],
                 row["status"],
                 now_utc,
-            ])
+            ]
+            for row in data
+        )
 
     _publish_rows(sh, "Raw_Results", header, rows)
 
-def publish_raw_heat_points(session_id: int) -> None:
-    if not CFG.app.publish_points:
-        return
+_RAW_HEAT_POINTS_HEADER = [
+    "EventID","ClassID","Class","SessionID","SessionName","Version","Basis",
+    "DriverID","Pos","Number","First","Last","Base","Bonus","Total","UpdatedUTC"
+]
 
-    sh = _open_sheet()
+_RAW_POINTS_HEADER = [
+    "EventID","ClassID","Class","SessionID","SessionType","SessionName","Version","Basis",
+    "DriverID","Pos","Number","First","Last","Base","Bonus","Total","UpdatedUTC"
+]
+
+def _raw_points_rows(session_id: int) -> Tuple[List[List[Any]], List[List[Any]]]:
+    """
+    Build the Raw_HeatPoints and Raw_Points rows for a session from one fetch
+    of its latest OFFICIAL PointAwards (Heat or Qualifying).
+    Qualifying points are stored as integers in DB (1..N); Raw_Points renders
+    them as fractional (0.01..N*0.01), Raw_HeatPoints keeps the stored values.
+    """
     with SessionLocal() as db:
         sess = _get_session(db, session_id)
-        data = _fetch_heat_points(db, session_id)
+        data = _fetch_heat_points(db, session_id)  # uses PointAward table; works for Heat or Qualifying awards
 
         class_name = getattr(sess.race_class, "name", "") if sess else ""
         ver = _latest_version(db, session_id, "official") or 0
-        now_utc = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
-        header = [
-            "EventID","ClassID","Class","SessionID","SessionName","Version","Basis",
-            "DriverID","Pos","Number","First","Last","Base","Bonus","Total","UpdatedUTC"
-        ]
+        # session columns are the same on every row: read the ORM attributes once
+        event_id = sess.event_id if sess else None
+        class_id = sess.class_id if sess else None
+        s_id = sess.id if sess else None
+        s_type = getattr(sess, "session_type", "") if sess else ""
+        s_name = (sess.session_name or "") if sess else ""
 
-        rows: List[List[Any]] = []
+        # Determine whether to render fractional points (Qualifying)
+        is_qual = (s_type == "Qualifying")
+
+        heat_rows: List[List[Any]] = []
+        points_rows: List[List[Any]] = []
         for row in data:
-            driver_id = row.get("driver_id") if "driver_id" in row else None
-            rows.append([
-                sess.event_id if sess else None,
-                sess.class_id if sess else None,
+            driver_id = row.get("driver_id")
+            base = row["base"]
+            bonus = row["bonus"]
+            total = row["total"]
+            heat_rows.append([
+                event_id,
+                class_id,
                 class_name,
-                sess.id if sess else None,
-                (sess.session_name or "") if sess else "",
+                s_id,
+                s_name,
                 ver,
                 "official",
                 driver_id,
@@ -732,61 +942,25 @@ def publish_raw_heat_points(session_id: int) -> None:
                 row["number"],
                 row["first"],
                 row["last"],
-                row["base"],
-                row["bonus"],
-                row["total"],
+                base,
+                bonus,
+                total,
                 now_utc,
             ])
 
-    _publish_rows(sh, "Raw_HeatPoints", header, rows)
-
-def publish_raw_points(session_id: int) -> None:
-    """
-    Publish latest OFFICIAL points (Heat or Qualifying) for a session into Raw_Points.
-    Qualifying points are stored as integers in DB (1..N); render as fractional (0.01..N*0.01) in the sheet.
-    """
-    if not CFG.app.publish_points:
-        return
-
-    sh = _open_sheet()
-    with SessionLocal() as db:
-        sess = _get_session(db, session_id)
-        data = _fetch_heat_points(db, session_id)  # uses PointAward table; works for Heat or Qualifying awards
-
-        class_name = getattr(sess.race_class, "name", "") if sess else ""
-        ver = _latest_version(db, session_id, "official") or 0
-        now_utc = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
-        header = [
-            "EventID","ClassID","Class","SessionID","SessionType","SessionName","Version","Basis",
-            "DriverID","Pos","Number","First","Last","Base","Bonus","Total","UpdatedUTC"
-        ]
-
-        # Determine whether to render fractional points (Qualifying)
-        s_type = getattr(sess, "session_type", "") if sess else ""
-        s_name = (getattr(sess, "session_name", "") or "") if sess else ""
-        is_heat = (s_type == "Heat") or ("heat" in s_name.lower())
-        is_qual = (s_type == "Qualifying")
-
-        rows: List[List[Any]] = []
-        for row in data:
-            driver_id = row.get("driver_id") if "driver_id" in row else None
-            base = row["base"]
-            bonus = row["bonus"]
-            total = row["total"]
             # Render qualifying as fractional hundredths for Sheets display
             if is_qual:
                 base = float(base) / 100.0 if base is not None else 0.0
                 bonus = float(bonus) / 100.0 if bonus is not None else 0.0
                 total = float(total) / 100.0 if total is not None else 0.0
 
-            rows.append([
-                sess.event_id if sess else None,
-                sess.class_id if sess else None,
+            points_rows.append([
+                event_id,
+                class_id,
                 class_name,
-                sess.id if sess else None,
+                s_id,
                 s_type,
-                (sess.session_name or "") if sess else "",
+                s_name,
                 ver,
                 "official",
                 driver_id,
@@ -800,7 +974,42 @@ def publish_raw_points(session_id: int) -> None:
                 now_utc,
             ])
 
-    _publish_rows(sh, "Raw_Points", header, rows)
+    return heat_rows, points_rows
+
+def publish_raw_heat_points(session_id: int) -> None:
+    if not CFG.app.publish_points:
+        return
+
+    sh = _open_sheet()
+    heat_rows, _ = _raw_points_rows(session_id)
+    _publish_rows(sh, "Raw_HeatPoints", _RAW_HEAT_POINTS_HEADER, heat_rows)
+
+def publish_raw_points(session_id: int) -> None:
+    """
+    Publish latest OFFICIAL points (Heat or Qualifying) for a session into Raw_Points.
+    Qualifying points are stored as integers in DB (1..N); render as fractional (0.01..N*0.01) in the sheet.
+    """
+    if not CFG.app.publish_points:
+        return
+
+    sh = _open_sheet()
+    _, points_rows = _raw_points_rows(session_id)
+    _publish_rows(sh, "Raw_Points", _RAW_POINTS_HEADER, points_rows)
+
+def publish_raw_points_and_heat(session_id: int) -> None:
+    """
+    Publish Raw_HeatPoints and Raw_Points for a session together: one DB fetch
+    and one spreadsheet batchUpdate for both tabs.
+    """
+    if not CFG.app.publish_points:
+        return
+
+    sh = _open_sheet()
+    heat_rows, points_rows = _raw_points_rows(session_id)
+    _publish_tables(sh, [
+        ("Raw_HeatPoints", _RAW_HEAT_POINTS_HEADER, heat_rows),
+        ("Raw_Points", _RAW_POINTS_HEADER, points_rows),
+    ])
 
 def ensure_heat_points_class_views(event_id: int) -> None:
     """
@@ -811,22 +1020,11 @@ def ensure_heat_points_class_views(event_id: int) -> None:
     sh = _open_sheet()
     with SessionLocal() as db:
         # Get all classes for this event
-        classes = db.query(RaceSession.class_id, RaceSession.event_id).filter(RaceSession.event_id == event_id).distinct().all()
-        # Map class_id -> name
-        names: Dict[int, str] = {}
-        for cid, _ in classes:
-            rc = db.query(RaceSession).filter(RaceSession.class_id == cid, RaceSession.event_id == event_id).first()
-            if rc and rc.race_class and rc.race_class.name:
-                names[cid] = rc.race_class.name
-
-    def sanitize_title(title: str) -> str:
-        bad = ":/\\?*[]"
-        out = "".join(ch for ch in title if ch not in bad)
-        return out[:95]
+        names = _class_names(db, event_id)
 
+    writes: List[Tuple[str, List[List[Any]]]] = []
     for _, cname in names.items():
-        tab = f"HeatPoints_{sanitize_title(cname)}"
-        ws = _safe_ws(sh, tab, rows=1000, cols=18)
+        tab = f"HeatPoints_{_sanitize_title(cname)}"
         # Header (match Raw_Points)
         header = [
             "EventID","ClassID","Class","SessionID","SessionType","SessionName","Version","Basis",
@@ -835,10 +1033,12 @@ def ensure_heat_points_class_views(event_id: int) -> None:
         # FILTER rows by Class (col C) and Heat by SessionType (col E) or SessionName (col F)
         # Use USER_ENTERED for formulas
         formula = (
-            f"=FILTER('Raw_Points'!A2:Q, ('Raw_Points'!C:C=\"{cname}\") * ( (REGEXMATCH('Raw_Points'!F:F, \"Heat\")) + ('Raw_Points'!E:E=\"Heat\") ))"
+            f"=FILTER('Raw_Points'!A2:Q, ('Raw_Points'!C2:C=\"{cname}\") * ( (REGEXMATCH('Raw_Points'!F2:F, \"Heat\")) + ('Raw_Points'!E2:E=\"Heat\") ))"
         )
-        ws.clear()
-        ws.update(range_name="A1", values=[header, [formula]], value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+        writes.append((tab, [header, [formula]]))
+    # every class tab: one add for the missing ones, one clear + one write
+    added = _ensure_tabs(sh, [(tab, 1000, 18) for tab, _ in writes])
+    _batch_replace(sh, writes, {title: (0, 0) for title in added})
 
 def ensure_simple_views(event_id: int) -> None:
     """
@@ -850,33 +1050,35 @@ def ensure_simple_views(event_id: int) -> None:
     sh = _open_sheet()
 
     # HeatPoints_View
-    ws_hp = _safe_ws(sh, "HeatPoints_View", rows=1000, cols=18)
     hp_header = [
         "EventID","ClassID","Class","SessionID","SessionType","SessionName","Version","Basis",
         "DriverID","Pos","Number","First","Last","Base","Bonus","Total","UpdatedUTC"
     ]
     hp_top = [["Class Filter", ""], hp_header]
     hp_formula = (
-        "=FILTER('Raw_Points'!A2:Q, ('Raw_Points'!C:C=$B$1) * ((REGEXMATCH('Raw_Points'!F:F, \"Heat\")) + ('Raw_Points'!E:E=\"Heat\")))"
+        "=FILTER('Raw_Points'!A2:Q, ('Raw_Points'!C2:C=$B$1) * ((REGEXMATCH('Raw_Points'!F2:F, \"Heat\")) + ('Raw_Points'!E2:E=\"Heat\")))"
     )
-    ws_hp.clear()
-    ws_hp.update(range_name="A1", values=hp_top + [[hp_formula]], value_input_option="USER_ENTERED")  # type: ignore[arg-type]
 
     # HeatTotals_View
-    ws_ht = _safe_ws(sh, "HeatTotals_View", rows=1000, cols=12)
     ht_header = ["EventID","ClassID","Class","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","Rank","UpdatedUTC"]
     ht_top = [["Class Filter", ""], ht_header]
-    ht_formula = "=FILTER('Raw_HeatTotals'!A2:J, 'Raw_HeatTotals'!C:C=$B$1)"
-    ws_ht.clear()
-    ws_ht.update(range_name="A1", values=ht_top + [[ht_formula]], value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+    ht_formula = "=FILTER('Raw_HeatTotals'!A2:J, 'Raw_HeatTotals'!C2:C=$B$1)"
 
     # LCQ_View
-    ws_lcq = _safe_ws(sh, "LCQ_View", rows=1000, cols=12)
     lcq_header = ht_header
     lcq_top = [["Class Filter", ""], ["Cutoff Rank", "28"], lcq_header]
-    lcq_formula = "=FILTER('Raw_HeatTotals'!A2:J, ('Raw_HeatTotals'!C:C=$B$1) * ('Raw_HeatTotals'!I:I>$B$2))"
-    ws_lcq.clear()
-    ws_lcq.update(range_name="A1", values=lcq_top + [[lcq_formula]], value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+    lcq_formula = "=FILTER('Raw_HeatTotals'!A2:J, ('Raw_HeatTotals'!C2:C=$B$1) * ('Raw_HeatTotals'!I2:I>$B$2))"
+
+    added = _ensure_tabs(sh, [
+        ("HeatPoints_View", 1000, 18),
+        ("HeatTotals_View", 1000, 12),
+        ("LCQ_View", 1000, 12),
+    ])
+    _batch_replace(sh, [
+        ("HeatPoints_View", hp_top + [[hp_formula]]),
+        ("HeatTotals_View", ht_top + [[ht_formula]]),
+        ("LCQ_View", lcq_top + [[lcq_formula]]),
+    ], {title: (0, 0) for title in added})
 
 # =========================
 # Class-focused single-tab publishers (simple outputs)
@@ -895,35 +1097,39 @@ def publish_class_results_view(session_id: int) -> None:
         tab_name = f"{class_name} Results"
 
         header = ["Class", "Session", "Pos", "#", "Driver", "Team", "Chassis", "Best Lap", "Last Lap", "Status", "Updated"]
-        rows: List[List[Any]] = []
+        rows: List[List[Any]]
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        session_label = f"{sess.session_type} - {sess.session_name or ''}" if sess else ""
 
         if sess.session_type not in ("Heat", "Qualifying"):
-            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             rows = [[f"Session '{sess.session_type}' is not Heat/Qualifying", now]]
         else:
-            for row in data:
-                rows.append([
+            rows = [
+                [
                     class_name,
-                    f"{sess.session_type} - {sess.session_name or ''}" if sess else "",
+                    session_label,
                     row.get("pos") or "",
                     row.get("number", ""),
-                    f"{row.get('first','')} {row.get('last','')}".strip(),
+                    row.get("full_name", ""),
                     row.get("team", ""),
                     row.get("chassis", ""),
                     _ms(row.get("best_ms")),
                     _ms(row.get("last_ms")),
                     row.get("status", ""),
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                ])
+                    now,
+                ]
+                for row in data
+            ]
 
     # Merge/update behavior: read existing tab, remove rows for this session (if any), then rewrite
     ws = _safe_ws(sh, tab_name, rows=1000, cols=16)
     try:
         existing = ws.get_all_values()
+        known = {ws.title: _values_extent(existing)}
     except Exception:
         existing = []
+        known = None
 
-    session_label = f"{sess.session_type} - {sess.session_name or ''}" if sess else ""
     new_body: List[List[Any]] = []
     if existing:
         existing_header = existing[0]
@@ -941,412 +1147,354 @@ def publish_class_results_view(session_id: int) -> None:
         new_body.append(rr)
 
     if new_body:
-        ws.clear()
-        ws.update(range_name="A1", values=new_body, value_input_option="USER_ENTERED")  # type: ignore[arg-type]
-
-def publish_class_heat_totals_view(class_id: int, event_id: int) -> None:
+        _batch_replace(sh, [(ws.title, new_body)], known)
+
+_Table = Tuple[str, List[str], List[List[Any]]]
+
+@dataclass
+class ClassStandings:
+    """Everything the standings tabs of one (event, class) are built from."""
+    class_name: Optional[str]
+    heat_ids: List[int]
+    q_ids: List[int]
+    agg: Dict[int, int]                 # driver_id -> official Heat points
+    qual_best_pos: Dict[int, int]       # driver_id -> best official Qualifying position
+    num_by_driver: Dict[int, str]
+    name_by_driver: Dict[int, str]
+    ranked: List[int]                   # driver ids by points, qual tiebreak, name
+
+def _compute_class_standings(db, class_id: int, event_id: int) -> ClassStandings:
     """
-    Publish cumulative totals for the class into 'Class_HeatTotals'.
-    Totals = sum(Heat points) + sum(Qualifying points). Qualifying displayed as fractional (x/100).
-    Overwrites the tab each time.
+    Heat points standings of a class, ranked by total official Heat points
+    with the best official Qualifying position as tiebreak, then name.
+    agg/ranked are empty when the class has no Heat sessions. Memoized in
+    the DB session's info dict like _number_map, so every tab built in one
+    session (a bundle, or a view plus its raw tab) shares the queries.
     """
-    sh = _open_sheet()
-    with SessionLocal() as db:
-        # Heat sessions
-        heat_ids = [sid for (sid,) in db.query(RaceSession.id)
-                                .filter(RaceSession.event_id == event_id,
-                                        RaceSession.class_id == class_id,
-                                        RaceSession.session_type == "Heat").all()]
-        # Qual sessions
-        qual_ids = [sid for (sid,) in db.query(RaceSession.id)
-                                .filter(RaceSession.event_id == event_id,
-                                        RaceSession.class_id == class_id,
-                                        RaceSession.session_type == "Qualifying").all()]
-
-        # Map number and names
-        num_by_driver: Dict[int, str] = {}
-        for e in db.query(Entry).filter(Entry.event_id == event_id, Entry.class_id == class_id).all():
-            num_by_driver[e.driver_id] = e.number or ""
-
-        class_name = (db.query(RaceSession)
-                        .filter(RaceSession.class_id == class_id, RaceSession.event_id == event_id)
-                        .first())
-        class_name = class_name.race_class.name if class_name and class_name.race_class else ""
-
-        # Latest official awards for Heat
-        heat_pts: Dict[int, int] = {}
-        if heat_ids:
-            sub_latest_h = (
-                db.query(PointAward.session_id, func.max(PointAward.version).label("v"))
-                  .filter(PointAward.session_id.in_(heat_ids), PointAward.basis == "official")
-                  .group_by(PointAward.session_id)
-                  .subquery()
-            )
-            for pa in db.query(PointAward).join(sub_latest_h, (PointAward.session_id == sub_latest_h.c.session_id) & (PointAward.version == sub_latest_h.c.v)).all():
-                heat_pts[pa.driver_id] = heat_pts.get(pa.driver_id, 0) + (pa.total_points or 0)
-
-        # Latest official awards for Qualifying
-        qual_pts: Dict[int, int] = {}
-        if qual_ids:
-            sub_latest_q = (
-                db.query(PointAward.session_id, func.max(PointAward.version).label("v"))
-                  .filter(PointAward.session_id.in_(qual_ids), PointAward.basis == "official")
-                  .group_by(PointAward.session_id)
-                  .subquery()
-            )
-            for pa in db.query(PointAward).join(sub_latest_q, (PointAward.session_id == sub_latest_q.c.session_id) & (PointAward.version == sub_latest_q.c.v)).all():
-                qual_pts[pa.driver_id] = qual_pts.get(pa.driver_id, 0) + (pa.total_points or 0)
-
-        # Qualifying best position tiebreak as backup
-        qual_best_pos: Dict[int, int] = {}
-        if qual_ids:
-            sub_latest_qr = (
-                db.query(Result.session_id, func.max(Result.version).label("v"))
-                  .filter(Result.session_id.in_(qual_ids), Result.basis == "official")
-                  .group_by(Result.session_id)
-                  .subquery()
-            )
-            for r in db.query(Result).join(sub_latest_qr, (Result.session_id == sub_latest_qr.c.session_id) & (Result.version == sub_latest_qr.c.v)).filter(Result.position.isnot(None)).all():
-                cur = qual_best_pos.get(r.driver_id)
-                if cur is None or (r.position or 10**6) < cur:
-                    qual_best_pos[r.driver_id] = r.position or cur or 10**6
-
-        # Aggregate
-        drivers = set(heat_pts.keys()) | set(qual_pts.keys())
-        def key_fn(did: int):
-            # total used for ranking; qual as tiebreaker; then number as stable
-            return (
-                (heat_pts.get(did, 0) + (qual_pts.get(did, 0) / 100.0)),
-                qual_best_pos.get(did, 10**6),
-                num_by_driver.get(did, "")
+    key = ("class_standings", event_id, class_id)
+    st = db.info.get(key)
+    if st is not None:
+        return st
+
+    heat_ids, q_ids = _class_session_ids(db, event_id, class_id)
+    agg: Dict[int, int] = {}
+    name_by_driver: Dict[int, str] = {}
+    if heat_ids:
+        agg, name_by_driver = _heat_point_totals(db, heat_ids)
+    qual_best_pos = _qual_best_positions(db, q_ids)
+
+    def key_fn(drv_id: int):
+        return (agg.get(drv_id, 10**6),
+                qual_best_pos.get(drv_id, 10**6),
+                name_by_driver.get(drv_id, ""))
+
+    st = ClassStandings(
+        class_name=_class_name(db, event_id, class_id),
+        heat_ids=heat_ids,
+        q_ids=q_ids,
+        agg=agg,
+        qual_best_pos=qual_best_pos,
+        num_by_driver=_number_map(db, event_id, class_id),
+        name_by_driver=name_by_driver,
+        ranked=sorted(agg.keys(), key=key_fn),
+    )
+    db.info[key] = st
+    return st
+
+def _class_heat_totals_table(db, class_id: int, event_id: int) -> _Table:
+    """(tab, header, rows) for '<ClassName> Heat Totals'; see publish_class_heat_totals_view."""
+    st = _compute_class_standings(db, class_id, event_id)
+    num_by_driver = st.num_by_driver
+    qual_best_pos = st.qual_best_pos
+    class_name = st.class_name or ""
+
+    # Latest official awards for Heat, already summed by the standings
+    heat_pts = st.agg
+
+    # Latest official awards for Qualifying
+    qual_pts = _official_point_sums(db, st.q_ids)
+
+    # Aggregate
+    drivers = set(heat_pts.keys()) | set(qual_pts.keys())
+    # heat drivers' names come with the standings; the qual-only ones in one IN query
+    names = dict(st.name_by_driver)
+    missing = drivers - names.keys()
+    if missing:
+        names.update(
+            (did, f"{first} {last}".strip())
+            for did, first, last in db.execute(
+                select(Driver.id, Driver.first_name, Driver.last_name).where(Driver.id.in_(missing))
             )
-        ranked = sorted(drivers, key=key_fn)
+        )
+    def key_fn(did: int):
+        # total used for ranking; qual as tiebreaker; then number as stable
+        return (
+            (heat_pts.get(did, 0) + (qual_pts.get(did, 0) / 100.0)),
+            qual_best_pos.get(did, 10**6),
+            num_by_driver.get(did, "")
+        )
+    ranked = sorted(drivers, key=key_fn)
+
+    header = ["Class","Rank","#","Driver","HeatPts","QualPts","TotalPts","QualTiebreak","Updated"]
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows: List[List[Any]] = []
+    for i, did in enumerate(ranked, start=1):
+        h = heat_pts.get(did, 0)
+        q = qual_pts.get(did, 0) / 100.0
+        rows.append([
+            class_name,
+            i,
+            num_by_driver.get(did, ""),
+            names.get(did, ""),
+            h,
+            q,
+            h + q,
+            qual_best_pos.get(did, ""),
+            now,
+        ])
 
-        header = ["Class","Rank","#","Driver","HeatPts","QualPts","TotalPts","QualTiebreak","Updated"]
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        rows: List[List[Any]] = []
-        for i, did in enumerate(ranked, start=1):
-            # fetch driver name
-            drow = db.get(Driver, did)
-            name = f"{getattr(drow, 'first_name', '')} {getattr(drow, 'last_name', '')}".strip() if drow else ""
-            h = heat_pts.get(did, 0)
-            q = qual_pts.get(did, 0) / 100.0
-            rows.append([
-                class_name,
-                i,
-                num_by_driver.get(did, ""),
-                name,
-                h,
-                q,
-                h + q,
-                qual_best_pos.get(did, ""),
-                now,
-            ])
+    return f"{class_name} Heat Totals", header, rows
 
-    tab_name = f"{class_name} Heat Totals"
-    _publish_rows(sh, tab_name, header, rows)
+def _class_prefinal_table(db, class_id: int, event_id: int) -> _Table:
+    """(tab, header, rows) for '<ClassName> Prefinal'; see publish_class_prefinal_view."""
+    header = ["Class","Grid Pos","#","Driver","Total Heat Pts","Qual Tiebreak","Updated"]
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    st = _compute_class_standings(db, class_id, event_id)
+    if not st.heat_ids:
+        return "Class_Prefinal", header, [["", "No Heat sessions found for this class/event.", "", "", "", "", now]]
+    # Class name
+    class_name = st.class_name or "Unknown"
 
-def publish_class_prefinal_view(class_id: int, event_id: int) -> None:
-    """
-    Build Prefinal grid for the class/event and write to 'Class_Prefinal'.
-    Uses cumulative Heat points with Qualifying tiebreak (same as Raw_PrefinalGrid).
-    """
-    sh = _open_sheet()
-    with SessionLocal() as db:
-        # Reuse Raw_PrefinalGrid logic to compute ordering
-        # Heat session IDs
-        heat_ids = [sid for (sid,) in db.query(RaceSession.id)
-                               .filter(RaceSession.event_id == event_id,
-                                       RaceSession.class_id == class_id,
-                                       RaceSession.session_type == "Heat").all()]
-        if not heat_ids:
-            _publish_rows(sh, "Class_Prefinal",
-                          ["Class","Grid Pos","#","Driver","Total Heat Pts","Qual Tiebreak","Updated"],
-                          [["", "No Heat sessions found for this class/event.", "", "", "", "", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]])
-            return
+    rows: List[List[Any]] = []
+    for i, did in enumerate(st.ranked, start=1):
+        rows.append([
+            class_name,
+            i,
+            st.num_by_driver.get(did, ""),
+            st.name_by_driver.get(did, ""),
+            st.agg.get(did, 0),
+            st.qual_best_pos.get(did, ""),
+            now,
+        ])
 
-        sub_latest = (
-            db.query(PointAward.session_id, func.max(PointAward.version).label("v"))
-              .filter(PointAward.session_id.in_(heat_ids), PointAward.basis == "official")
-              .group_by(PointAward.session_id)
-              .subquery()
-        )
-        qa = (
-            db.query(PointAward, Driver)
-              .join(Driver, Driver.id == PointAward.driver_id)
-              .join(sub_latest, (PointAward.session_id == sub_latest.c.session_id) & (PointAward.version == sub_latest.c.v))
-              .all()
-        )
-        agg: Dict[int, int] = {}
-        name_by_driver: Dict[int, str] = {}
-        num_by_driver: Dict[int, str] = {}
-        for e in db.query(Entry).filter(Entry.event_id == event_id, Entry.class_id == class_id).all():
-            num_by_driver[e.driver_id] = e.number or ""
-        for pa, d in qa:
-            agg[d.id] = agg.get(d.id, 0) + (pa.total_points or 0)
-            name_by_driver[d.id] = f"{d.first_name} {d.last_name}".strip()
-
-        # Qualifying tiebreak: best official qualifying position
-        q_ids = [sid for (sid,) in db.query(RaceSession.id)
-                               .filter(RaceSession.event_id == event_id,
-                                       RaceSession.class_id == class_id,
-                                       RaceSession.session_type == "Qualifying").all()]
-        qual_best_pos: Dict[int, int] = {}
-        if q_ids:
-            sub_latest_q = (db.query(Result.session_id, func.max(Result.version).label("v"))
-                              .filter(Result.session_id.in_(q_ids), Result.basis == "official")
-                              .group_by(Result.session_id)
-                              .subquery())
-            for r in (db.query(Result)
-                        .join(sub_latest_q, (Result.session_id == sub_latest_q.c.session_id) & (Result.version == sub_latest_q.c.v))
-                        .filter(Result.position.isnot(None)).all()):
-                cur = qual_best_pos.get(r.driver_id)
-                if cur is None or (r.position or 10**6) < cur:
-                    qual_best_pos[r.driver_id] = r.position or cur or 10**6
-
-        def key_fn(drv_id: int):
-            return (agg.get(drv_id, 10**6),
-                    qual_best_pos.get(drv_id, 10**6),
-                    name_by_driver.get(drv_id, ""))
-        ranked = sorted(agg.keys(), key=key_fn)
-
-        # Class name
-        cls = (db.query(RaceSession)
-                 .filter(RaceSession.class_id == class_id, RaceSession.event_id == event_id)
-                 .first())
-        class_name = cls.race_class.name if cls and cls.race_class else "Unknown"
-
-        header = ["Class","Grid Pos","#","Driver","Total Heat Pts","Qual Tiebreak","Updated"]
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        rows: List[List[Any]] = []
-        for i, did in enumerate(ranked, start=1):
-            rows.append([
-                class_name,
-                i,
-                num_by_driver.get(did, ""),
-                name_by_driver.get(did, ""),
-                agg.get(did, 0),
-                qual_best_pos.get(did, ""),
-                now,
-            ])
+    return f"{class_name} Prefinal", header, rows
 
-    tab_name = f"{class_name} Prefinal"
-    _publish_rows(sh, tab_name, header, rows)
+def _raw_prefinal_grid_table(db, class_id: int, event_id: int) -> _Table:
+    """(tab, header, rows) for Raw_PrefinalGrid; see publish_raw_prefinal_grid."""
+    header = ["EventID","ClassID","Class","GridPos","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","UpdatedUTC"]
+    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    st = _compute_class_standings(db, class_id, event_id)
+    if not st.heat_ids:
+        return "Raw_PrefinalGrid", header, [["", "", "No Heat sessions found for this class/event.", "", "", "", "", "", "", now_utc]]
+    class_name = st.class_name or ""
 
-def publish_raw_prefinal_grid(class_id: int, event_id: int) -> None:
-    """
-    Publish normalized prefinal grid to Raw_PrefinalGrid.
-    """
-    if not CFG.app.publish_prefinal_grid:
-        return
+    rows: List[List[Any]] = []
+    for i, drv_id in enumerate(st.ranked, start=1):
+        rows.append([
+            event_id, class_id, class_name, i, drv_id,
+            st.num_by_driver.get(drv_id, ""),
+            st.name_by_driver.get(drv_id, ""),
+            st.agg.get(drv_id, 0),
+            st.qual_best_pos.get(drv_id, ""),
+            now_utc
+        ])
 
-    sh = _open_sheet()
-    with SessionLocal() as db:
-        heat_ids = [
-            sid for (sid,) in db.query(RaceSession.id)
-                                 .filter(RaceSession.event_id == event_id,
-                                         RaceSession.class_id == class_id,
-                                         RaceSession.session_type == "Heat")
-                                 .all()
-        ]
-        if not heat_ids:
-            _publish_rows(sh, "Raw_PrefinalGrid",
-                          ["EventID","ClassID","Class","GridPos","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","UpdatedUTC"],
-                          [["", "", "No Heat sessions found for this class/event.", "", "", "", "", "", "", datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")]])
-            return
+    return "Raw_PrefinalGrid", header, rows
 
-        sub_latest = (
-            db.query(PointAward.session_id, func.max(PointAward.version).label("v"))
-              .filter(PointAward.session_id.in_(heat_ids), PointAward.basis == "official")
-              .group_by(PointAward.session_id)
-              .subquery()
-        )
+def _raw_heat_totals_table(db, class_id: int, event_id: int) -> _Table:
+    """(tab, header, rows) for Raw_HeatTotals; see publish_raw_heat_totals."""
+    header = ["EventID","ClassID","Class","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","Rank","UpdatedUTC"]
+    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    st = _compute_class_standings(db, class_id, event_id)
+    if not st.heat_ids:
+        return "Raw_HeatTotals", header, [[event_id, class_id, "No Heat sessions found for this class/event.", "", "", "", "", "", "", now_utc]]
+    class_name = st.class_name or ""
 
-        qa = (
-            db.query(PointAward, Driver)
-              .join(Driver, Driver.id == PointAward.driver_id)
-              .join(sub_latest, (PointAward.session_id == sub_latest.c.session_id) &
-                               (PointAward.version == sub_latest.c.v))
-              .all()
-        )
+    rows: List[List[Any]] = []
+    for i, drv_id in enumerate(st.ranked, start=1):
+        rows.append([
+            event_id, class_id, class_name,
+            drv_id,
+            st.num_by_driver.get(drv_id, ""),
+            st.name_by_driver.get(drv_id, ""),
+            st.agg.get(drv_id, 0),
+            st.qual_best_pos.get(drv_id, ""),
+            i,
+            now_utc
+        ])
 
-        agg: Dict[int, int] = {}
-        name_by_driver: Dict[int, str] = {}
-        num_by_driver: Dict[int, str] = {}
-        for e in db.query(Entry).filter(Entry.event_id == event_id,
-                                        Entry.class_id == class_id).all():
-            num_by_driver[e.driver_id] = e.number or ""
-
-        for pa, d in qa:
-            agg[d.id] = agg.get(d.id, 0) + (pa.total_points or 0)
-            name_by_driver[d.id] = f"{d.first_name} {d.last_name}".strip()
-
-        q_ids = [
-            sid for (sid,) in db.query(RaceSession.id)
-                                 .filter(RaceSession.event_id == event_id,
-                                         RaceSession.class_id == class_id,
-                                         RaceSession.session_type == "Qualifying")
-                                 .all()
-        ]
-        qual_best_pos: Dict[int, int] = {}
-        if q_ids:
-            sub_latest_q = (
-                db.query(Result.session_id, func.max(Result.version).label("v"))
-                  .filter(Result.session_id.in_(q_ids), Result.basis == "official")
-                  .group_by(Result.session_id)
-                  .subquery()
-            )
-            qres = (
-                db.query(Result)
-                  .join(sub_latest_q, (Result.session_id == sub_latest_q.c.session_id) &
-                                     (Result.version == sub_latest_q.c.v))
-                  .filter(Result.position.isnot(None))
-                  .all()
-            )
-            for r in qres:
-                cur = qual_best_pos.get(r.driver_id)
-                if cur is None or (r.position or 10**6) < cur:
-                    qual_best_pos[r.driver_id] = r.position or cur or 10**6
+    return "Raw_HeatTotals", header, rows
 
-        def key_fn(drv_id: int):
-            return (agg.get(drv_id, 10**6),
-                    qual_best_pos.get(drv_id, 10**6),
-                    name_by_driver.get(drv_id, ""))
+# (builder name, spreadsheet id, event_id, class_id) -> (data version, rows hash, monotonic time)
+# of the last table written from this process, so a re-publish with nothing
+# changed skips the aggregation and/or the Sheets write.
+_PUBLISH_CACHE: Dict[Tuple[str, Any, int, int], Tuple[Tuple[Any, ...], int, float]] = {}
+_PUBLISH_CACHE_LOCK = threading.Lock()
+# The cache cannot see the sheet itself: a tab edited by hand or by another
+# process is only repaired once its entry is older than this. The listener's
+# publish worker goes through the cache (publish_session_class_bundle);
+# steward-triggered publishes pass force=True and bypass it altogether.
+_PUBLISH_CACHE_TTL = 120.0
 
-        ranked = sorted(agg.keys(), key=key_fn)
+def _class_data_version(db, event_id: int, class_id: int) -> Tuple[Any, ...]:
+    """
+    (max id, count) of the class's PointAwards and Results in one SELECT, plus
+    a hash of the class roster (driver id, kart number, driver name). New
+    versions only ever insert rows and deletes change the counts; renames and
+    number edits happen in place and change the roster hash. An unchanged
+    tuple means unchanged standings inputs.
+    """
+    sids = (
+        select(RaceSession.id)
+          .where(RaceSession.event_id == event_id, RaceSession.class_id == class_id)
+          .scalar_subquery()
+    )
+    ids = tuple(db.execute(select(
+        select(func.max(PointAward.id)).where(PointAward.session_id.in_(sids)).scalar_subquery(),
+        select(func.count(PointAward.id)).where(PointAward.session_id.in_(sids)).scalar_subquery(),
+        select(func.max(Result.id)).where(Result.session_id.in_(sids)).scalar_subquery(),
+        select(func.count(Result.id)).where(Result.session_id.in_(sids)).scalar_subquery(),
+    )).one())
+    roster = db.execute(
+        select(Entry.driver_id, Entry.number, Driver.first_name, Driver.last_name)
+          .join(Driver, Driver.id == Entry.driver_id)
+          .where(Entry.event_id == event_id, Entry.class_id == class_id)
+          .order_by(Entry.driver_id)
+    ).all()
+    return ids + (hash(tuple(map(tuple, roster))),)
+
+def _rows_hash(table: Tuple[str, List[str], List[List[Any]]]) -> int:
+    """Hash of a (tab, header, rows) table, without the trailing Updated timestamp column."""
+    tab, header, rows = table
+    return hash((tab, tuple(header), tuple(tuple(r[:-1]) for r in rows)))
+
+def _publish_class_tables(class_id: int, event_id: int, builders, force: bool = False) -> None:
+    """
+    Build the (class_id, event_id) tables with the given _*_table builders and
+    write them in one _publish_tables call. A builder whose cached data
+    version is unchanged (and younger than _PUBLISH_CACHE_TTL) is not run; a
+    rebuilt table whose rows hash the same as last time is not rewritten.
+    force=True (an explicit publish) bypasses both checks: every table is
+    rebuilt and written, and the cache is refreshed.
+    When something has to be built, the spreadsheet's tab list is read on a
+    worker thread while the tables are aggregated, so the Sheets round-trip
+    overlaps the DB work instead of following it.
+    """
+    now = time.monotonic()
+    sheet_id = CFG.google.spreadsheet_id
+    pending: List[Tuple[Tuple[str, Any, int, int], int, Tuple[str, List[str], List[List[Any]]]]] = []
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets-meta")
+    try:
+        with SessionLocal() as db:
+            version = _class_data_version(db, event_id, class_id)
+            with _PUBLISH_CACHE_LOCK:
+                cached = {b.__name__: _PUBLISH_CACHE.get((b.__name__, sheet_id, event_id, class_id)) for b in builders}
+            stale = []
+            for build in builders:
+                hit = cached[build.__name__]
+                fresh = not force and hit is not None and now - hit[2] < _PUBLISH_CACHE_TTL
+                if not (fresh and hit[0] == version):
+                    stale.append((build, hit if fresh else None))
+            if not stale:
+                return
+
+            tabs_future = pool.submit(lambda: _open_sheet().worksheets())
+            for build, hit in stale:
+                key = (build.__name__, sheet_id, event_id, class_id)
+                table = build(db, class_id, event_id)
+                digest = _rows_hash(table)
+                if hit is not None and hit[1] == digest:
+                    # same rows from newer data: remember the version, skip the write
+                    with _PUBLISH_CACHE_LOCK:
+                        _PUBLISH_CACHE[key] = (version, digest, hit[2])
+                    continue
+                pending.append((key, digest, table))
+        # DB session closed: only now wait on the Sheets read
+        worksheets = tabs_future.result()
+        sh = _open_sheet()
+    finally:
+        pool.shutdown(wait=False)
+
+    if not pending:
+        return
+    _publish_tables(sh, [table for _, _, table in pending], worksheets)
+    with _PUBLISH_CACHE_LOCK:
+        for key, digest, _ in pending:
+            _PUBLISH_CACHE[key] = (version, digest, now)
 
-        class_name = (db.query(RaceSession)
-                        .filter(RaceSession.class_id == class_id,
-                                RaceSession.event_id == event_id)
-                        .first())
-        class_name = class_name.race_class.name if class_name and class_name.race_class else ""
+def publish_class_heat_totals_view(class_id: int, event_id: int, force: bool = False) -> None:
+    """
+    Publish cumulative totals for the class into 'Class_HeatTotals'.
+    Totals = sum(Heat points) + sum(Qualifying points). Qualifying displayed as fractional (x/100).
+    Overwrites the tab each time. force=True bypasses the unchanged-data cache.
+    """
+    _publish_class_tables(class_id, event_id, [_class_heat_totals_table], force)
 
-        header = ["EventID","ClassID","Class","GridPos","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","UpdatedUTC"]
-        now_utc = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+def publish_class_prefinal_view(class_id: int, event_id: int, force: bool = False) -> None:
+    """
+    Build Prefinal grid for the class/event and write to 'Class_Prefinal'.
+    Uses cumulative Heat points with Qualifying tiebreak (same as Raw_PrefinalGrid).
+    force=True bypasses the unchanged-data cache.
+    """
+    _publish_class_tables(class_id, event_id, [_class_prefinal_table], force)
 
-        rows: List[List[Any]] = []
-        for i, drv_id in enumerate(ranked, start=1):
-            rows.append([
-                event_id, class_id, class_name, i, drv_id,
-                num_by_driver.get(drv_id, ""),
-                name_by_driver.get(drv_id, ""),
-                agg.get(drv_id, 0),
-                qual_best_pos.get(drv_id, ""),
-                now_utc
-            ])
+def publish_raw_prefinal_grid(class_id: int, event_id: int, force: bool = False) -> None:
+    """
+    Publish normalized prefinal grid to Raw_PrefinalGrid.
+    force=True bypasses the unchanged-data cache.
+    """
+    if not CFG.app.publish_prefinal_grid:
+        return
 
-    _publish_rows(sh, "Raw_PrefinalGrid", header, rows)
+    _publish_class_tables(class_id, event_id, [_raw_prefinal_grid_table], force)
 
-def publish_raw_heat_totals(class_id: int, event_id: int) -> None:
+def publish_raw_heat_totals(class_id: int, event_id: int, force: bool = False) -> None:
     """
     Publish cumulative Heat points standings per class/event into Raw_HeatTotals.
     Tie-breaker: best official Qualifying position (lower is better).
-    Includes Rank for convenience.
+    Includes Rank for convenience. force=True bypasses the unchanged-data cache.
     """
     if not CFG.app.publish_prefinal_grid and not CFG.app.publish_points:
         # If either toggle is off, we still allow totals when points are being used.
         pass
 
-    sh = _open_sheet()
-    with SessionLocal() as db:
-        # Heat session IDs
-        heat_ids = [
-            sid for (sid,) in db.query(RaceSession.id)
-                                 .filter(RaceSession.event_id == event_id,
-                                         RaceSession.class_id == class_id,
-                                         RaceSession.session_type == "Heat")
-                                 .all()
-        ]
-        if not heat_ids:
-            _publish_rows(sh, "Raw_HeatTotals",
-                          ["EventID","ClassID","Class","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","Rank","UpdatedUTC"],
-                          [[event_id, class_id, "No Heat sessions found for this class/event.", "", "", "", "", "", "", datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")]])
-            return
-
-        sub_latest = (
-            db.query(PointAward.session_id, func.max(PointAward.version).label("v"))
-              .filter(PointAward.session_id.in_(heat_ids), PointAward.basis == "official")
-              .group_by(PointAward.session_id)
-              .subquery()
-        )
-
-        qa = (
-            db.query(PointAward, Driver)
-              .join(Driver, Driver.id == PointAward.driver_id)
-              .join(sub_latest, (PointAward.session_id == sub_latest.c.session_id) &
-                               (PointAward.version == sub_latest.c.v))
-              .all()
-        )
-
-        agg: Dict[int, int] = {}
-        name_by_driver: Dict[int, str] = {}
-        num_by_driver: Dict[int, str] = {}
-        for e in db.query(Entry).filter(Entry.event_id == event_id,
-                                        Entry.class_id == class_id).all():
-            num_by_driver[e.driver_id] = e.number or ""
-
-        for pa, d in qa:
-            agg[d.id] = agg.get(d.id, 0) + (pa.total_points or 0)
-            name_by_driver[d.id] = f"{d.first_name} {d.last_name}".strip()
-
-        # Qualifying tiebreak: best official qualifying position
-        q_ids = [
-            sid for (sid,) in db.query(RaceSession.id)
-                                 .filter(RaceSession.event_id == event_id,
-                                         RaceSession.class_id == class_id,
-                                         RaceSession.session_type == "Qualifying")
-                                 .all()
-        ]
-        qual_best_pos: Dict[int, int] = {}
-        if q_ids:
-            sub_latest_q = (
-                db.query(Result.session_id, func.max(Result.version).label("v"))
-                  .filter(Result.session_id.in_(q_ids), Result.basis == "official")
-                  .group_by(Result.session_id)
-                  .subquery()
-            )
-            qres = (
-                db.query(Result)
-                  .join(sub_latest_q, (Result.session_id == sub_latest_q.c.session_id) &
-                                     (Result.version == sub_latest_q.c.v))
-                  .filter(Result.position.isnot(None))
-                  .all()
-            )
-            for r in qres:
-                cur = qual_best_pos.get(r.driver_id)
-                if cur is None or (r.position or 10**6) < cur:
-                    qual_best_pos[r.driver_id] = r.position or cur or 10**6
-
-        def key_fn(drv_id: int):
-            return (agg.get(drv_id, 10**6),
-                    qual_best_pos.get(drv_id, 10**6),
-                    name_by_driver.get(drv_id, ""))
-
-        ranked = sorted(agg.keys(), key=key_fn)
-
-        class_name = (db.query(RaceSession)
-                        .filter(RaceSession.class_id == class_id,
-                                RaceSession.event_id == event_id)
-                        .first())
-        class_name = class_name.race_class.name if class_name and class_name.race_class else ""
+    _publish_class_tables(class_id, event_id, [_raw_heat_totals_table], force)
 
-        header = ["EventID","ClassID","Class","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","Rank","UpdatedUTC"]
-        now_utc = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
-        rows: List[List[Any]] = []
-        for i, drv_id in enumerate(ranked, start=1):
-            rows.append([
-                event_id, class_id, class_name,
-                drv_id,
-                num_by_driver.get(drv_id, ""),
-                name_by_driver.get(drv_id, ""),
-                agg.get(drv_id, 0),
-                qual_best_pos.get(drv_id, ""),
-                i,
-                now_utc
-            ])
-
-    _publish_rows(sh, "Raw_HeatTotals", header, rows)
+def publish_event_class_bundle(class_id: int, event_id: int, force: bool = False,
+                               heat_totals: bool = True, prefinal: bool = True) -> None:
+    """
+    Refresh the per-class tabs of (class_id, event_id) with one Sheets write:
+    the Heat Totals view (heat_totals) and the Prefinal view (prefinal), each
+    with its Raw_HeatTotals / Raw_PrefinalGrid twin when raw tabs are enabled
+    (same toggles as the single publishers). All tables are built from one DB
+    session, so the shared standings and kart numbers are queried once, then
+    go out in a single batchUpdate instead of one request per tab.
+    force=True bypasses the unchanged-data cache.
+    """
+    raw = getattr(CFG.app, "publish_raw_tabs", False)
+    builders = []
+    if heat_totals:
+        builders.append(_class_heat_totals_table)
+        if raw:
+            builders.append(_raw_heat_totals_table)
+    if prefinal:
+        builders.append(_class_prefinal_table)
+        if raw and CFG.app.publish_prefinal_grid:
+            builders.append(_raw_prefinal_grid_table)
+    if builders:
+        _publish_class_tables(class_id, event_id, builders, force)
+
+def publish_session_class_bundle(session_id: int) -> None:
+    """
+    Unforced publish_event_class_bundle for the class of session_id. Meant for
+    repeated callers such as the listener's publish worker: while the class's
+    PointAwards, Results and roster are unchanged it costs one version query
+    and no Sheets request.
+    """
+    with SessionLocal() as db:
+        sess = _get_session(db, session_id)
+        class_id, event_id = sess.class_id, sess.event_id
+    publish_event_class_bundle(class_id, event_id)
 
 def ensure_heat_totals_class_views(event_id: int) -> None:
     """
@@ -1356,24 +1504,39 @@ def ensure_heat_totals_class_views(event_id: int) -> None:
     sh = _open_sheet()
     with SessionLocal() as db:
         # All classes for the event
-        classes = db.query(RaceSession.class_id, RaceSession.event_id).filter(RaceSession.event_id == event_id).distinct().all()
-        names: Dict[int, str] = {}
-        for cid, _ in classes:
-            rc = db.query(RaceSession).filter(RaceSession.class_id == cid, RaceSession.event_id == event_id).first()
-            if rc and rc.race_class and rc.race_class.name:
-                names[cid] = rc.race_class.name
-
-    def sanitize_title(title: str) -> str:
-        bad = ":/\\?*[]"
-        out = "".join(ch for ch in title if ch not in bad)
-        return out[:95]
+        names = _class_names(db, event_id)
 
+    writes: List[Tuple[str, List[List[Any]]]] = []
     for _, cname in names.items():
-        tab = f"HeatTotals_{sanitize_title(cname)}"
-        ws = _safe_ws(sh, tab, rows=1000, cols=12)
+        tab = f"HeatTotals_{_sanitize_title(cname)}"
         header = ["EventID","ClassID","Class","DriverID","Number","Driver","TotalHeatPts","QualTiebreak","Rank","UpdatedUTC"]
         formula = (
-            f"=FILTER('Raw_HeatTotals'!A2:J, 'Raw_HeatTotals'!C:C=\"{cname}\")"
+            f"=FILTER('Raw_HeatTotals'!A2:J, 'Raw_HeatTotals'!C2:C=\"{cname}\")"
+        )
+        writes.append((tab, [header, [formula]]))
+    added = _ensure_tabs(sh, [(tab, 1000, 12) for tab, _ in writes])
+    _batch_replace(sh, writes, {title: (0, 0) for title in added})
+
+# =========================
+# Concurrent session publish
+# =========================
+def publish_all(session_id: int, publishers: Optional[Sequence[Any]] = None) -> None:
+    """
+    Run independent per-session publishers side by side. Each one writes its
+    own tab(s) and opens its own DB session, so they only share the network
+    wait; Sheets writes are capped by _SHEETS_WRITE_SEMA. Every publisher
+    still honours its CFG toggle. The first failure is re-raised once all
+    have finished.
+    """
+    if publishers is None:
+        publishers = (
+            publish_official_results,
+            publish_heat_points,
+            publish_raw_results,
+            publish_raw_points_and_heat,
         )
-        ws.clear()
-        ws.update(range_name="A1", values=[header, [formula]], value_input_option="USER_ENTERED")  # type: ignore[arg-type]
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="sheets-publish") as pool:
+        futures = [pool.submit(fn, session_id) for fn in publishers]
+    errors = [f.exception() for f in futures if f.exception() is not None]
+    if errors:
+        raise errors[0]
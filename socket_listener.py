@@ -2,20 +2,22 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import logging
-import csv
 import re
 import time
 import threading
 import queue
 import socket
+import sys
 
 from datetime import datetime, timezone, date
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import event, func, lambda_stmt, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from db import SessionLocal, init_db
 from models import Driver, Event, RaceClass, Session as RaceSession, Entry, Lap, Result
@@ -26,6 +28,7 @@ from models import Driver, Event, RaceClass, Session as RaceSession, Entry, Lap,
 MIN_VALID_LAP_MS = 30_000       # ignore < 30.000s (spikes / pits / noise)
 CROSS_WINDOW_MS = 1100          # window to collect same-lap $G lines after leader
 SAME_LAP_GRACE_WINDOWS = 1      # grace windows for unseen-but-same-lap drivers
+NO_TIME_MS = 10**12             # "no time" sentinel: blank/bad times, missing best/crossing
 CHECKERED_STRINGS = {"checkered", "chequered", "finish", "finished", "chequer", "check"}
 
 # Exposed handles if you embed in threads
@@ -43,8 +46,9 @@ def _ensure_publish_worker_started() -> None:
     """Start the background publish worker thread once (idempotent).
 
     The worker drains session ids from _publish_queue, de-duplicates them
-    and calls sheets_publish.publish_live_heat_points(session_id). The
-    worker runs as a daemon thread and swallows exceptions to avoid
+    and calls sheets_publish.publish_live_heat_points(session_id), then
+    refreshes the session's class tabs through the publish cache
+    (sheets_publish.publish_session_class_bundle). The worker runs as a daemon thread and swallows exceptions to avoid
     impacting the ingest path.
     """
     global _publish_worker_thread, _publish_stop_event
@@ -87,6 +91,13 @@ def _ensure_publish_worker_started() -> None:
                         publish_live_heat_points(psid)
                     except Exception:
                         logger.exception("publish_live_heat_points failed for session %s", psid)
+                    try:
+                        # class standings tabs; skipped without a Sheets call
+                        # while the class's official data is unchanged
+                        from sheets_publish import publish_session_class_bundle
+                        publish_session_class_bundle(psid)
+                    except Exception:
+                        logger.exception("publish_session_class_bundle failed for session %s", psid)
 
                 # clear pending and sleep briefly to rate-limit writes
                 pending.clear()
@@ -193,19 +204,112 @@ def _drain_and_publish_now() -> None:
 
 # ---------------------- CSV / time helpers ----------------------
 
+def _kart_num(f: List[str], i: int) -> str:
+    """Stripped kart number field, interned.
+
+    The same handful of kart numbers key every per-kart dict and arrive on
+    every passing line, so sharing one str object per number keeps the heap
+    flat and lets dict lookups hit the identity fast path.
+    """
+    return sys.intern(_field(f, i).strip())
+
+
+def _split_orbits(line: str) -> List[str]:
+    """Split one Orbits line on commas, unquoting fields in the same pass.
+
+    Only the subset Orbits emits is handled: ``,`` separators and ``"``-quoted
+    fields where a literal quote is doubled. Blanks before an opening quote are
+    skipped, so ``$G, 1, "12"`` yields ``["$G", " 1", "12"]``.
+    """
+    out: List[str] = []
+    n = len(line)
+    i = 0
+    while True:
+        j = i
+        while j < n and line[j] == " ":
+            j += 1
+        if j < n and line[j] == '"':
+            # quoted field: copy up to the closing quote, folding "" -> "
+            j += 1
+            k = line.find('"', j)
+            if k < 0:
+                out.append(line[j:])
+                return out
+            if k + 1 < n and line[k + 1] == '"':
+                parts = [line[j:k + 1]]
+                j = k + 2
+                while True:
+                    k = line.find('"', j)
+                    if k < 0:
+                        parts.append(line[j:])
+                        out.append("".join(parts))
+                        return out
+                    if k + 1 < n and line[k + 1] == '"':
+                        parts.append(line[j:k + 1])
+                        j = k + 2
+                        continue
+                    parts.append(line[j:k])
+                    break
+                out.append("".join(parts))
+            else:
+                out.append(line[j:k])
+            # anything between the closing quote and the next comma is dropped
+            c = line.find(",", k + 1)
+            if c < 0:
+                return out
+            i = c + 1
+        else:
+            c = line.find(",", i)
+            if c < 0:
+                out.append(line[i:])
+                return out
+            out.append(line[i:c])
+            i = c + 1
+
+def _field(f: List[str], i: int, default: str = "") -> str:
+    return f[i] if i < len(f) else default
+
 def parse_csv_row(line: str) -> Tuple[Optional[str], List[str]]:
     line = (line or "").strip()
     if not line or not line.startswith("$"):
         return None, []
-    reader = csv.reader([line], delimiter=",", quotechar='"', skipinitialspace=False)
-    row = next(reader)
-    return (row[0], row[1:]) if row else (None, [])
+    row = _split_orbits(line)
+    return row[0], row[1:]
+
+_DIGIT_VAL = {str(d): d for d in range(10)}
+
+def _lap_ms_fast(s: str) -> Optional[int]:
+    """Digit-by-digit parse of the common 'M:SS.mmm' / 'MM:SS.mmm' lap shape.
 
-def time_to_ms(s: str) -> int:
+    Returns None when the string has any other shape so the caller can fall
+    back to the general parser.
+    """
+    n = len(s)
+    if n == 8:
+        c = 1
+    elif n == 9:
+        c = 2
+    else:
+        return None
+    if s[c] != ":" or s[c + 3] != ".":
+        return None
+    d = _DIGIT_VAL
+    try:
+        m = d[s[0]] if c == 1 else d[s[0]] * 10 + d[s[1]]
+        return (m * 60_000
+                + (d[s[c + 1]] * 10 + d[s[c + 2]]) * 1000
+                + d[s[c + 4]] * 100 + d[s[c + 5]] * 10 + d[s[c + 6]])
+    except KeyError:
+        return None
+
+def _parse_time_ms(s: str) -> int:
     """'mm:ss.mmm' or 'hh:mm:ss.mmm' → ms. Returns huge sentinel for blanks/bad."""
     s = (s or "").strip()
     if not s or s in ("00:00:00", "00:00:00.000"):
-        return 10**12
+        return NO_TIME_MS
+    fast = _lap_ms_fast(s)
+    if fast is not None:
+        return fast
     parts = s.split(":")
     if len(parts) == 3:
         h, m, sec = parts
@@ -213,20 +317,24 @@ def time_to_ms(s: str) -> int:
         h, m, sec = "0", parts[0], parts[1]
     else:
         # unexpected format (e.g. just seconds) — treat as invalid
-        return 10**12
-    if "." in sec:
-        sec_i, ms = sec.split(".", 1)
-    else:
-        sec_i, ms = sec, "0"
+        return NO_TIME_MS
+    # no fractional part leaves ms == "", which pads to "000" below
+    sec_i, _, ms = sec.partition(".")
     try:
         return int(h) * 3_600_000 + int(m) * 60_000 + int(sec_i) * 1000 + int(ms.ljust(3, "0")[:3])
     except ValueError:
-        return 10**12
+        return NO_TIME_MS
+
+# Orbits re-sends the same best/last strings on every $H/$SR/$SP/$J refresh, so
+# most calls are repeats; a bounded C-level memo turns those into one dict hit.
+# $G session-elapsed stamps are unique per line and call _parse_time_ms directly
+# so they don't churn the cache.
+time_to_ms = functools.lru_cache(maxsize=4096)(_parse_time_ms)
 
 def parseTimeSTR(s: str) -> Optional[float]:
     """Legacy helper: returns seconds (float) or None."""
     ms = time_to_ms((s or "").strip().strip('"'))
-    if ms >= 10**12:
+    if ms >= NO_TIME_MS:
         return None
     return ms / 1000.0
 
@@ -270,7 +378,7 @@ def extract_group(name: str) -> Optional[str]:
 
 # ---------------------- In-memory live state ----------------------
 
-@dataclass
+@dataclass(slots=True)
 class DriverState:
     number: str
     first: str = ""
@@ -280,7 +388,7 @@ class DriverState:
     transponder: str = ""
     active: bool = True
 
-@dataclass
+@dataclass(slots=True)
 class TimingState:
     session_name: str = ""
     session_type: str = ""
@@ -294,6 +402,8 @@ class TimingState:
     # live timing (strings preserved for fidelity)
     best_lap_str: Dict[str, str] = field(default_factory=dict)    # "mm:ss.mmm"
     last_lap_str: Dict[str, str] = field(default_factory=dict)    # "mm:ss.mmm"
+    best_lap_ms: Dict[str, int] = field(default_factory=dict)     # parsed best_lap_str
+    last_lap_ms: Dict[str, int] = field(default_factory=dict)     # parsed last_lap_str
     lap_no: Dict[str, int] = field(default_factory=dict)          # per kart
     order_pos: Dict[str, int] = field(default_factory=dict)       # last seen $G position
     status_by_num: Dict[str, str] = field(default_factory=dict)   # 0/1/2/3
@@ -318,6 +428,8 @@ class TimingState:
     def reset_for_new_session(self):
         self.best_lap_str.clear()
         self.last_lap_str.clear()
+        self.best_lap_ms.clear()
+        self.last_lap_ms.clear()
         self.lap_no.clear()
         self.order_pos.clear()
         self.status_by_num.clear()
@@ -343,6 +455,20 @@ class TimingState:
 class OrbitsParser:
     def __init__(self):
         self.s = TimingState()
+        # tag -> bound handler; parseLine does one dict lookup per line
+        self._handlers: Dict[str, Callable[[List[str]], None]] = {
+            "$A": self._handle_A,
+            "$B": self._handle_B,
+            "$C": self._handle_C,
+            "$COMP": self._handle_COMP,
+            "$E": self._handle_E,
+            "$F": self._handle_F,
+            "$G": self._handle_G,
+            "$H": self._handle_passing,
+            "$J": self._handle_J,
+            "$SP": self._handle_passing,
+            "$SR": self._handle_passing,
+        }
 
     # --- crossing window machinery ---
     def _open_window(self, lap: int):
@@ -379,9 +505,11 @@ class OrbitsParser:
         target_lap = self.s.window_lap
 
         # ensure everyone exists in display_order
+        present = set(self.s.display_order)
         for num in self.s.drivers.keys():
-            if num not in self.s.display_order:
+            if num not in present:
                 self.s.display_order.append(num)
+        order_idx = {num: i for i, num in enumerate(self.s.display_order)}
 
         def key_for(num: str) -> Tuple[int, int, int, int, str]:
             laps = self.s.lap_no.get(num, 0)
@@ -397,12 +525,8 @@ class OrbitsParser:
             else:
                 posk = 99999
 
-            cross = self.s.win_cross_ms.get(num, self.s.g_last_cross_ms.get(num, 10**12))
-            try:
-                idx = self.s.display_order.index(num)
-            except ValueError:
-                idx = 99999
-            return (k1, posk, cross, idx, num)
+            cross = self.s.win_cross_ms.get(num, self.s.g_last_cross_ms.get(num, NO_TIME_MS))
+            return (k1, posk, cross, order_idx.get(num, 99999), num)
 
         nums = list(self.s.display_order)
         nums.sort(key=key_for)
@@ -421,161 +545,182 @@ class OrbitsParser:
         self._close_window()
 
     # --- line parser ---
-    def parseLine(self, line: str):
-        tag, f = parse_csv_row(line)
-        if not tag:
-            return
+    def parseLine(self, line: str) -> bool:
+        """Apply one raw feed line; returns False for blank/non-Orbits lines."""
+        line = (line or "").strip()
+        if not line.startswith("$"):
+            return False
+        # Classify on the tag prefix before tokenizing, so records we don't
+        # handle ($RMS, $RMLT, $RMHL, ...) are never split at all.
+        comma = line.find(",")
+        tag = line if comma < 0 else line[:comma]
+        handler = self._handlers.get(tag)
+        if handler is not None:
+            handler(_split_orbits(line[comma + 1:]) if comma >= 0 else [])
+        # try committing window after each line
+        self._maybe_commit_window()
+        return True
+
+    # --- per-tag handlers (f excludes the tag itself) ---
+    def _handle_B(self, f: List[str]):
+        # $B,43,"Practice 1 - P1"   or   $B,,"Qualifying 2"
+        new_name = _field(f, 1).strip()
+        if new_name:
+            if new_name != self.s.session_name:
+                self.s.reset_for_new_session()
+            self.s.session_name = new_name
+            self.s.session_type = lock_session_type(self.s.session_name)
+            self.s.session_group = extract_group(self.s.session_name)
+
+    def _handle_C(self, f: List[str]):
+        raw = _field(f, 1).strip()
+        self.s.class_name = strip_group_token(raw)
+
+    def _handle_E(self, f: List[str]):
+        key = _field(f, 0).strip().upper()
+        val = _field(f, 1).strip()
+        if key == "TRACKNAME":
+            self.s.track_name = val
+        elif key == "TRACKLENGTH":
+            try:
+                self.s.track_length = float(val)
+            except Exception:
+                pass
+        elif key in {"MEETING", "EVENT", "EVENTNAME", "TITLE"}:
+            self.s.event_name = val
 
-        def get(i: int, default: str = "") -> str:
-            return f[i] if i < len(f) else default
-
-        if tag == "$B":
-            # $B,43,"Practice 1 - P1"   or   $B,,"Qualifying 2"
-            quoted_fields = [x for x in f if x.strip().startswith('"') and x.strip().endswith('"')]
-            new_name = (quoted_fields[-1] if quoted_fields else (f[1] if len(f) > 1 else "")).strip()
-            if new_name:
-                new_name = new_name.strip('"')
-                if new_name != self.s.session_name:
-                    self.s.reset_for_new_session()
-                self.s.session_name = new_name
-                self.s.session_type = lock_session_type(self.s.session_name)
-                self.s.session_group = extract_group(self.s.session_name)
-
-        elif tag == "$C":
-            raw = get(1, "").strip().strip('"')
-            self.s.class_name = strip_group_token(raw)
-
-        elif tag == "$E":
-            key = get(0, "").strip().strip('"').upper()
-            val = get(1, "").strip().strip('"')
-            if key == "TRACKNAME":
-                self.s.track_name = val
-            elif key == "TRACKLENGTH":
-                try:
-                    self.s.track_length = float(val)
-                except Exception:
-                    pass
-            elif key in {"MEETING", "EVENT", "EVENTNAME", "TITLE"}:
-                self.s.event_name = val
-
-        elif tag == "$A":
-            # $A,"<num>","<num>",<transponder>,"First","Last","Chassis",1
-            num = get(0, "").strip().strip('"') or get(1, "").strip().strip('"')
-            if not num:
-                return
-            d = self.s.drivers.get(num, DriverState(num))
-            d.transponder = get(2, d.transponder).strip().strip('"')
-            d.first = get(3, d.first).strip().strip('"')
-            d.last = get(4, d.last).strip().strip('"')
-            d.chassis = get(5, d.chassis).strip().strip('"')
-            act = get(6, "")
-            if act:
-                try:
-                    d.active = int(act) == 1
-                except Exception:
-                    pass
+    def _handle_A(self, f: List[str]):
+        # $A,"<num>","<num>",<transponder>,"First","Last","Chassis",1
+        num = _kart_num(f, 0) or _kart_num(f, 1)
+        if not num:
+            return
+        d = self.s.drivers.get(num)
+        is_new = d is None
+        if is_new:
+            d = DriverState(num)
+        d.transponder = _field(f, 2, d.transponder).strip()
+        d.first = sys.intern(_field(f, 3, d.first).strip())
+        d.last = sys.intern(_field(f, 4, d.last).strip())
+        d.chassis = sys.intern(_field(f, 5, d.chassis).strip())
+        act = _field(f, 6)
+        if act:
+            try:
+                d.active = int(act) == 1
+            except Exception:
+                pass
+        if is_new:
+            # drivers and display_order gain members together, so only a
+            # first sighting needs appending
             self.s.drivers[num] = d
-            if num not in self.s.display_order:
-                self.s.display_order.append(num)
+            self.s.display_order.append(num)
 
-        elif tag == "$COMP":
-            # $COMP,"<num>","<num>",<transponder>,"First","Last","Chassis","Team"
-            num = get(0, "").strip().strip('"') or get(1, "").strip().strip('"')
-            if not num:
-                return
-            d = self.s.drivers.get(num, DriverState(num))
-            d.first = get(3, d.first).strip().strip('"')
-            d.last = get(4, d.last).strip().strip('"')
-            d.chassis = get(5, d.chassis).strip().strip('"')
-            d.team = get(6, d.team).strip().strip('"')
+    def _handle_COMP(self, f: List[str]):
+        # $COMP,"<num>","<num>",<transponder>,"First","Last","Chassis","Team"
+        num = _kart_num(f, 0) or _kart_num(f, 1)
+        if not num:
+            return
+        d = self.s.drivers.get(num)
+        is_new = d is None
+        if is_new:
+            d = DriverState(num)
+        d.first = sys.intern(_field(f, 3, d.first).strip())
+        d.last = sys.intern(_field(f, 4, d.last).strip())
+        d.chassis = sys.intern(_field(f, 5, d.chassis).strip())
+        d.team = sys.intern(_field(f, 6, d.team).strip())
+        if is_new:
+            # drivers and display_order gain members together, so only a
+            # first sighting needs appending
             self.s.drivers[num] = d
-            if num not in self.s.display_order:
-                self.s.display_order.append(num)
+            self.s.display_order.append(num)
+
+    def _handle_F(self, f: List[str]):
+        # $F,9999,"00:01:16","16:45:26","00:06:43","Green "
+        self.s.flag = _field(f, 4, _field(f, 5)).strip()
+
+    def _handle_G(self, f: List[str]):
+        # $G, <pos>, "<num>", <lap_no>, "<session_elapsed>"
+        pos_str = _field(f, 0).strip()
+        num = _kart_num(f, 1)
+        laps_str = _field(f, 2).strip()
+        sess_elapsed = _field(f, 3).strip()
+        if not num:
+            return
 
-        elif tag == "$F":
-            # $F,9999,"00:01:16","16:45:26","00:06:43","Green "
-            self.s.flag = get(4, get(5, "")).strip().strip('"')
-
-        elif tag == "$G":
-            # $G, <pos>, "<num>", <lap_no>, "<session_elapsed>"
-            pos_str = get(0, "").strip()
-            raw_num = get(1, "").strip()
-            num = raw_num.strip('"') if raw_num else raw_num
-            laps_str = get(2, "").strip()
-            sess_elapsed = get(3, "").strip().strip('"')
-
-            if num:
-                if pos_str.isdigit():
-                    self.s.order_pos[num] = int(pos_str)
-                if laps_str.isdigit():
-                    cur_lap = int(laps_str)
-                    self.s.lap_no[num] = max(self.s.lap_no.get(num, 0), cur_lap)
+        if pos_str.isdigit():
+            self.s.order_pos[num] = int(pos_str)
+        if laps_str.isdigit():
+            cur_lap = int(laps_str)
+            self.s.lap_no[num] = max(self.s.lap_no.get(num, 0), cur_lap)
+        else:
+            cur_lap = None
+
+        if sess_elapsed and cur_lap is not None:
+            cur_ms = _parse_time_ms(sess_elapsed)
+            prev_lap = self.s.g_last_cross_lap.get(num)
+            prev_ms = self.s.g_last_cross_ms.get(num)
+            if prev_lap is not None and prev_ms is not None and cur_lap > prev_lap:
+                delta = cur_ms - prev_ms
+                if MIN_VALID_LAP_MS <= delta < 15 * 60 * 1000:
+                    mm = delta // 60000
+                    ss = (delta // 1000) % 60
+                    ms = delta % 1000
+                    lap_str = f"{mm:02d}:{ss:02d}.{ms:03d}"
+                    self.s.last_lap_str[num] = lap_str
+                    self.s.last_lap_ms[num] = delta
+                    if delta < self.s.best_lap_ms.get(num, NO_TIME_MS):
+                        self.s.best_lap_str[num] = lap_str
+                        self.s.best_lap_ms[num] = delta
+            self.s.g_last_cross_lap[num] = cur_lap
+            self.s.g_last_cross_ms[num] = cur_ms
+
+        # Open window when leader starts a new lap
+        if pos_str == "1" and cur_lap is not None:
+            if (not self.s.window_active) and (cur_lap > self.s.leader_lap):
+                self._open_window(cur_lap)
+
+        # Collect to current window
+        if cur_lap is not None:
+            cross_ms = self.s.g_last_cross_ms.get(num, None)
+            pos_val = int(pos_str) if pos_str.isdigit() else None
+            self._window_collect(num, pos_val, cross_ms, cur_lap)
+
+    def _handle_passing(self, f: List[str]):
+        # $H / $SR / $SP normalized: pos, num, laps, last_time, status
+        pos = _field(f, 0).strip()
+        num = _kart_num(f, 1)
+        laps_str = _field(f, 2).strip()
+        last_time = _field(f, 3).strip()
+        status = _field(f, 4, "0").strip()
+        if laps_str.isdigit():
+            self.s.lap_no[num] = max(self.s.lap_no.get(num, 0), int(laps_str))
+        if num and last_time:
+            ms = time_to_ms(last_time)
+            if ms >= MIN_VALID_LAP_MS:
+                self.s.last_lap_str[num] = last_time
+                if ms < NO_TIME_MS:
+                    self.s.last_lap_ms[num] = ms
                 else:
-                    cur_lap = None
-
-                if sess_elapsed and cur_lap is not None:
-                    cur_ms = time_to_ms(sess_elapsed)
-                    prev_lap = self.s.g_last_cross_lap.get(num)
-                    prev_ms = self.s.g_last_cross_ms.get(num)
-                    if prev_lap is not None and prev_ms is not None and cur_lap > prev_lap:
-                        delta = cur_ms - prev_ms
-                        if MIN_VALID_LAP_MS <= delta < 15 * 60 * 1000:
-                            mm = delta // 60000
-                            ss = (delta // 1000) % 60
-                            ms = delta % 1000
-                            lap_str = f"{mm:02d}:{ss:02d}.{ms:03d}"
-                            self.s.last_lap_str[num] = lap_str
-                            prev_best = self.s.best_lap_str.get(num)
-                            if not prev_best or delta < time_to_ms(prev_best):
-                                self.s.best_lap_str[num] = lap_str
-                    self.s.g_last_cross_lap[num] = cur_lap
-                    self.s.g_last_cross_ms[num] = cur_ms
-
-                # Open window when leader starts a new lap
-                if pos_str == "1" and cur_lap is not None:
-                    if (not self.s.window_active) and (cur_lap > self.s.leader_lap):
-                        self._open_window(cur_lap)
-
-                # Collect to current window
-                if cur_lap is not None:
-                    cross_ms = self.s.g_last_cross_ms.get(num, None)
-                    pos_val = int(pos_str) if pos_str.isdigit() else None
-                    self._window_collect(num, pos_val, cross_ms, cur_lap)
-
-        elif tag in ("$H", "$SR", "$SP"):
-            # Normalized: pos, num, laps, last_time, status
-            pos = get(0, "").strip()
-            num = get(1, "").strip().strip('"')
-            laps_str = get(2, "").strip()
-            last_time = get(3, "").strip().strip('"')
-            status = get(4, "0").strip().strip('"')
-            if laps_str.isdigit():
-                self.s.lap_no[num] = max(self.s.lap_no.get(num, 0), int(laps_str))
-            if num and last_time:
-                ms = time_to_ms(last_time)
-                if ms >= MIN_VALID_LAP_MS:
-                    self.s.last_lap_str[num] = last_time
-                    prev_best = self.s.best_lap_str.get(num)
-                    if not prev_best or ms < time_to_ms(prev_best):
-                        self.s.best_lap_str[num] = last_time
-            if pos and pos.isdigit():
-                self.s.order_pos[num] = int(pos)
-            if status:
-                self.s.status_by_num[num] = status
-
-        elif tag == "$J":
-            # $J,"<num>","<best>","<last>"
-            num = get(0, "").strip().strip('"')
-            best = get(1, "").strip().strip('"')
-            if num and best:
-                ms = time_to_ms(best)
-                if ms >= MIN_VALID_LAP_MS:
-                    prev = self.s.best_lap_str.get(num)
-                    if not prev or ms < time_to_ms(prev):
-                        self.s.best_lap_str[num] = best
-
-        # try committing window after each line
-        self._maybe_commit_window()
+                    # blank/garbage time: no last lap, as when it was parsed
+                    # back from last_lap_str at upsert time
+                    self.s.last_lap_ms.pop(num, None)
+                if ms < self.s.best_lap_ms.get(num, NO_TIME_MS):
+                    self.s.best_lap_str[num] = last_time
+                    self.s.best_lap_ms[num] = ms
+        if pos and pos.isdigit():
+            self.s.order_pos[num] = int(pos)
+        if status:
+            self.s.status_by_num[num] = status
+
+    def _handle_J(self, f: List[str]):
+        # $J,"<num>","<best>","<last>"
+        num = _kart_num(f, 0)
+        best = _field(f, 1).strip()
+        if num and best:
+            ms = time_to_ms(best)
+            if ms >= MIN_VALID_LAP_MS:
+                if ms < self.s.best_lap_ms.get(num, NO_TIME_MS):
+                    self.s.best_lap_str[num] = best
+                    self.s.best_lap_ms[num] = ms
 
 # ---------------------- Merge helpers (safe, row-by-row) ----------------------
 
@@ -691,6 +836,36 @@ def _merge_event_into(db: Session, src: Event, dst: Event) -> None:
 
 # ---------------------- DB ingest ----------------------
 
+# Bumped whenever a Driver or Entry row is updated or deleted through the ORM
+# (UI edits, event/class merges, the ingestor's own renames) so DBIngestor
+# knows its memo of already-synced karts may be stale. Only sees this
+# process; apply() also checks memo hits against the entries table.
+_dimension_epoch = 0
+
+
+def _bump_dimension_epoch(*_args) -> None:
+    global _dimension_epoch
+    _dimension_epoch += 1
+
+
+for _cls in (Driver, Entry):
+    for _evt in ("after_update", "after_delete"):
+        event.listen(_cls, _evt, _bump_dimension_epoch)
+
+# Lap batch insert that is idempotent on the (session, driver, lap) key: a
+# lap the feed re-sends (or a second listener already wrote) refreshes its
+# time instead of failing the whole tick with an IntegrityError. is_valid is
+# left alone so a re-send can't undo a manual invalidation.
+_lap_insert = sqlite_insert(Lap)
+_LAP_UPSERT = _lap_insert.on_conflict_do_update(
+    index_elements=[Lap.session_id, Lap.driver_id, Lap.lap_number],
+    set_={
+        "lap_time_ms": _lap_insert.excluded.lap_time_ms,
+        "timestamp_ms": _lap_insert.excluded.timestamp_ms,
+    },
+)
+
+
 class DBIngestor:
     def __init__(self, SessionLocal):
         self.SessionLocal = SessionLocal
@@ -698,6 +873,14 @@ class DBIngestor:
         self.current_event_id: Optional[int] = None
         self.current_class_id: Optional[int] = None
         self._last_session_id: Optional[int] = None
+        # class-fastest Qualifying rollup, see _class_fastest_qual_ms
+        self._qual_best_session_id: Optional[int] = None
+        self._qual_other_best_ms: Optional[int] = None
+        self._qual_session_best_ms: Optional[int] = None
+        # (event_id, class_id, number) -> (DriverState fields last written, driver_id);
+        # a kart whose feed fields haven't changed skips the driver/entry sync
+        self._synced_karts: Dict[Tuple[int, int, str], Tuple[Tuple[str, ...], int]] = {}
+        self._synced_epoch = _dimension_epoch
         # (live publish handled by background worker)
 
     # ---- Event/Class with safe rename/merge ----
@@ -787,11 +970,11 @@ class DBIngestor:
         base = (session_name or session_type or "Session").strip()
         name = f"{base} [{group_tag}]" if (session_type == "Qualifying" and group_tag) else base
 
-        sess = db.query(RaceSession).filter(
+        sess = db.scalars(lambda_stmt(lambda: select(RaceSession).where(
             RaceSession.event_id == event_id,
             RaceSession.class_id == class_id,
             RaceSession.session_name == name,
-        ).one_or_none()
+        ))).one_or_none()
         if not sess:
             sess = RaceSession(
                 event_id=event_id,
@@ -817,22 +1000,24 @@ class DBIngestor:
         return sess
 
     # ---- Entities ----
+    # The per-tick lookups below run for every kart on every feed line, so
+    # they are lambda_stmt()s: the SELECT is built once per call site and
+    # later calls only rebind the closure values.
 
     def _last_saved_lap(self, db: Session, session_id: int, driver_id: int, number: str) -> int:
         if number in self.saved_lap_no:
             return self.saved_lap_no[number]
-        max_no = db.query(func.max(Lap.lap_number)).filter(
+        max_no = db.scalar(lambda_stmt(lambda: select(func.max(Lap.lap_number)).where(
             Lap.session_id == session_id, Lap.driver_id == driver_id
-        ).scalar() or 0
+        ))) or 0
         self.saved_lap_no[number] = max_no
         return max_no
 
     def get_or_create_driver(self, db: Session, number: str, driver_state: DriverState) -> Driver:
-        driver = (
-            db.query(Driver)
-            .filter(Driver.first_name == driver_state.first, Driver.last_name == driver_state.last)
-            .first()
-        )
+        first, last = driver_state.first, driver_state.last
+        driver = db.scalars(lambda_stmt(lambda: select(Driver).where(
+            Driver.first_name == first, Driver.last_name == last
+        ).limit(1))).first()
         if not driver:
             driver = Driver(
                 first_name=driver_state.first,
@@ -860,11 +1045,11 @@ class DBIngestor:
 
     def get_or_create_entry(self, db: Session, drv: Driver, number: str,
                             event_id: int, class_id: int, driver_state: Optional[DriverState]) -> Entry:
-        ent = db.query(Entry).filter(
+        ent = db.scalars(lambda_stmt(lambda: select(Entry).where(
             Entry.event_id == event_id,
             Entry.class_id == class_id,
             Entry.number == number,
-        ).one_or_none()
+        ))).one_or_none()
 
         want_team = (driver_state.team if driver_state and driver_state.team else drv.team)
         want_chas = (driver_state.chassis if driver_state and driver_state.chassis else drv.chassis)
@@ -895,13 +1080,37 @@ class DBIngestor:
                 db.flush()
         return ent
 
+    def _class_fastest_qual_ms(self, db: Session, event_id: int, class_id: int, session_id: int) -> Optional[int]:
+        """Fastest best lap across all Qualifying sessions of this class.
+
+        The other sessions' results don't move while this one is live, so
+        their MIN is read once per session; this session's part is seeded
+        from the DB and then kept current by upsert() as bests are written.
+        """
+        if self._qual_best_session_id != session_id:
+            base = (
+                select(func.min(Result.best_lap_ms))
+                  .join(RaceSession, Result.session_id == RaceSession.id)
+                  .where(
+                      RaceSession.event_id == event_id,
+                      RaceSession.class_id == class_id,
+                      RaceSession.session_type == "Qualifying",
+                      Result.best_lap_ms.isnot(None),
+                  )
+            )
+            self._qual_other_best_ms = db.scalar(base.where(Result.session_id != session_id))
+            self._qual_session_best_ms = db.scalar(base.where(Result.session_id == session_id))
+            self._qual_best_session_id = session_id
+        known = [ms for ms in (self._qual_other_best_ms, self._qual_session_best_ms) if ms is not None]
+        return min(known) if known else None
+
     def get_or_create_result(self, db: Session, session_id: int, driver_id: int) -> Result:
-        res = db.query(Result).filter(
+        res = db.scalars(lambda_stmt(lambda: select(Result).where(
             Result.session_id == session_id,
             Result.driver_id == driver_id,
             Result.basis == "provisional",
             Result.version == 1,
-        ).one_or_none()
+        ))).one_or_none()
         if not res:
             res = Result(
                 session_id=session_id,
@@ -923,13 +1132,36 @@ class DBIngestor:
             sess = self.get_or_create_session(db, ev.id, rc.id, s.session_name, s.session_type, s.session_group)
 
             # 2) Ensure Drivers + Entries exist
+            if self._synced_epoch != _dimension_epoch:
+                self._synced_karts.clear()
+                self._synced_epoch = _dimension_epoch
             num_to_driver_id: Dict[str, int] = {}
+            newly_synced: List[Tuple[Tuple[int, int, str], Tuple[str, ...], int]] = []
+            entry_driver: Optional[Dict[str, int]] = None
             for number, driver_state in s.drivers.items():
+                sig = (driver_state.first, driver_state.last, driver_state.team,
+                       driver_state.chassis, driver_state.transponder)
+                hit = self._synced_karts.get((ev.id, rc.id, number))
+                if hit is not None and hit[0] == sig:
+                    if entry_driver is None:
+                        # one read per tick: another process (UI, API) may have
+                        # deleted or reassigned an Entry, which the mapper
+                        # events never see
+                        entry_driver = dict(db.execute(
+                            select(Entry.number, Entry.driver_id)
+                              .where(Entry.event_id == ev.id, Entry.class_id == rc.id)
+                        ).all())
+                    if entry_driver.get(number) == hit[1]:
+                        num_to_driver_id[number] = hit[1]
+                        continue
                 drv = self.get_or_create_driver(db, number, driver_state)
                 self.get_or_create_entry(db, drv, number, ev.id, rc.id, driver_state)
                 num_to_driver_id[number] = drv.id
+                newly_synced.append(((ev.id, rc.id, number), sig, drv.id))
 
-            # 3) Persist laps when lap_no increases & delta valid (derived from last_lap_str)
+            # 3) Persist laps when lap_no increases & delta valid (derived from last_lap_ms)
+            lap_rows: List[Dict[str, Any]] = []
+            now_ms = time.time_ns() // 1_000_000
             for num, cur_no in s.lap_no.items():
                 if num not in num_to_driver_id:
                     continue
@@ -938,62 +1170,51 @@ class DBIngestor:
                 if cur_no <= last_saved:
                     continue
 
-                # prefer derived from $G deltas; fallback to last_lap_str
-                if s.g_last_cross_lap.get(num) is not None and s.g_last_cross_ms.get(num) is not None:
-                    lap_str = s.last_lap_str.get(num, "")
-                    ms = time_to_ms(lap_str) if lap_str else 10**12
-                else:
-                    ms = time_to_ms(s.last_lap_str.get(num, ""))
+                # last lap is either a $G crossing delta or the $H/$SR/$SP time,
+                # already parsed by the feed handlers
+                ms = s.last_lap_ms.get(num, NO_TIME_MS)
 
                 if MIN_VALID_LAP_MS <= ms < 15 * 60 * 1000:
                     for ln in range(last_saved + 1, cur_no + 1):
-                        db.add(Lap(
-                            session_id=sess.id,
-                            driver_id=driver_id,
-                            lap_number=ln,
-                            lap_time_ms=ms,
-                            timestamp=datetime.now(timezone.utc),
-                            is_valid=1
-                        ))
+                        lap_rows.append({
+                            "session_id": sess.id,
+                            "driver_id": driver_id,
+                            "lap_number": ln,
+                            "lap_time_ms": ms,
+                            "timestamp_ms": now_ms,
+                            "is_valid": True,
+                        })
                     self.saved_lap_no[num] = cur_no
                 else:
                     # invalid → do not persist; keep saved_lap_no unchanged
                     pass
+            if lap_rows:
+                # one executemany for the whole tick instead of an ORM object per lap
+                db.execute(_LAP_UPSERT, lap_rows)
 
             # 4) Upsert results
-            best_ms_by_num: Dict[str, int] = {}
-            for n, t in s.best_lap_str.items():
-                ms = time_to_ms(t)
-                if ms < 10**12:
-                    best_ms_by_num[n] = ms
+            best_ms_by_num: Dict[str, int] = s.best_lap_ms
 
             # session-fastest for Practice; class-fastest across all Qualifying sessions for this class
             session_fastest_ms = min(best_ms_by_num.values()) if best_ms_by_num else None
             class_fastest_ms = None
             if sess.session_type == "Qualifying":
-                class_fastest_ms = (
-                    db.query(func.min(Result.best_lap_ms))
-                      .join(RaceSession, Result.session_id == RaceSession.id)
-                      .filter(
-                          RaceSession.event_id == ev.id,
-                          RaceSession.class_id == rc.id,
-                          RaceSession.session_type == "Qualifying",
-                          Result.best_lap_ms.isnot(None),
-                      )
-                      .scalar()
-                )
+                class_fastest_ms = self._class_fastest_qual_ms(db, ev.id, rc.id, sess.id)
 
             def upsert(num: str, position: Optional[int]):
                 driver_id = num_to_driver_id[num]
                 res = self.get_or_create_result(db, sess.id, driver_id)
 
-                last_ms = time_to_ms(s.last_lap_str.get(num, "")); last_ms = None if last_ms >= 10**12 else last_ms
+                last_ms = s.last_lap_ms.get(num)
                 best_ms = best_ms_by_num.get(num)
 
                 res.position = position
                 res.last_lap_ms = last_ms
                 if best_ms is not None and (res.best_lap_ms is None or best_ms < res.best_lap_ms):
                     res.best_lap_ms = best_ms
+                    if sess.id == self._qual_best_session_id and (
+                            self._qual_session_best_ms is None or best_ms < self._qual_session_best_ms):
+                        self._qual_session_best_ms = best_ms
 
                 st = s.status_by_num.get(num, "0")
                 if st == "1":
@@ -1020,9 +1241,8 @@ class DBIngestor:
             if sess.session_type in ("Practice", "Qualifying"):
                 # rank by best (asc), tiebreak by last $G position then number
                 nums = list(num_to_driver_id.keys())
-                SENTINEL = 10**12
                 def key_fn(n: str):
-                    b = best_ms_by_num.get(n, SENTINEL)
+                    b = best_ms_by_num.get(n, NO_TIME_MS)
                     p = s.order_pos.get(n, 99999)
                     return (b, p, n)
                 ranked = sorted(nums, key=key_fn)
@@ -1035,7 +1255,7 @@ class DBIngestor:
                     def approx_key(n: str) -> Tuple[int, int, int, str]:
                         laps = s.lap_no.get(n, 0)
                         pos = s.order_pos.get(n, 99999)
-                        cross = s.g_last_cross_ms.get(n, 10**12)
+                        cross = s.g_last_cross_ms.get(n, NO_TIME_MS)
                         return (-laps, pos, cross, n)
                     approx.sort(key=approx_key)
                     s.display_order = approx
@@ -1045,6 +1265,14 @@ class DBIngestor:
 
             db.commit()
 
+            # only remember karts once their rows are committed; if this tick
+            # itself updated a driver/entry, start the memo over from here
+            if self._synced_epoch != _dimension_epoch:
+                self._synced_karts.clear()
+                self._synced_epoch = _dimension_epoch
+            for key, sig, driver_id in newly_synced:
+                self._synced_karts[key] = (sig, driver_id)
+
             # 5) Flip to provisional on checker (once per session)
             flag = (parsed.s.flag or "").strip().lower()
             if flag in CHECKERED_STRINGS:
@@ -1105,12 +1333,10 @@ class OrbitsTCPReader:
                 for line in f:
                     if self._stop:
                         break
-                    line = line.strip("\r\n")
-                    if not line:
-                        continue
-
-                    self.parser.parseLine(line)
-                    self.ingestor.apply(self.parser)
+                    # parseLine strips the line itself and reports blanks/noise,
+                    # so there is no per-line copy here
+                    if self.parser.parseLine(line):
+                        self.ingestor.apply(self.parser)
 
             except (socket.timeout, ConnectionError, OSError) as e:
                 logging.getLogger(__name__).debug("Socket/connect/read error: %s", e)
@@ -25,10 +25,8 @@ from official import compute_official_order, write_official_and_award_points
 #   - publish_official_results(session_id) or publish_raw_results(session_id)
 #   - publish_heat_points(session_id) or publish_raw_heat_points(session_id)
 #   - publish_prefinal_grid(class_id, event_id) or publish_raw_prefinal_grid(class_id, event_id)
-from sheets_publish import (
-    publish_class_results_view, publish_class_heat_totals_view, publish_class_prefinal_view,
-    publish_raw_results, publish_raw_points, publish_raw_prefinal_grid, publish_raw_heat_totals,
-)
+# It is imported inside the publish actions: gspread/google-auth are slow to
+# import and only needed once the user actually pushes to Sheets.
 
 # config.py must define CFG (with points_scheme, publish toggles, etc.)
 from sn28_config import CFG
@@ -79,6 +77,12 @@ def get_latest_provisional(db, session_id: int) -> List[Dict]:
     class_id = getattr(sess, "class_id", None)
     event_id = getattr(sess, "event_id", None)
 
+    # Preload kart numbers for this class/event
+    num_by_driver: Dict[int, str] = {}
+    if class_id is not None and event_id is not None:
+        for e in db.query(Entry).filter(Entry.event_id == event_id, Entry.class_id == class_id).all():
+            num_by_driver[e.driver_id] = e.number or ""
+
     rows = (
         db.query(Result, Driver)
           .join(Driver, Driver.id == Result.driver_id)
@@ -91,17 +95,10 @@ def get_latest_provisional(db, session_id: int) -> List[Dict]:
 
     out: List[Dict] = []
     for r, d in rows:
-        # Resolve kart number for this class/event
-        num = ""
-        if class_id is not None and event_id is not None:
-            for e in d.entries:
-                if e.class_id == class_id and e.event_id == event_id:
-                    num = e.number or ""
-                    break
         out.append({
             "driver_id": d.id,
             "pos": r.position,
-            "num": num,
+            "num": num_by_driver.get(d.id, ""),
             "name": f"{(d.first_name or '')} {(d.last_name or '')}".strip(),
             "status": r.status_code or "",
             "best_ms": r.best_lap_ms,
@@ -649,6 +646,11 @@ class PenaltyApp(tk.Tk):
         with SessionLocal() as db:
             officials = compute_official_order(db, sid)
             # Need kart numbers and names
+            num_by_driver: Dict[int, str] = {
+                e.driver_id: e.number or ""
+                for e in db.query(Entry).filter(Entry.event_id == sess.event_id,
+                                                Entry.class_id == sess.class_id).all()
+            }
             num_cache: Dict[int, str] = {}
             name_cache: Dict[int, str] = {}
             for r in officials:
@@ -658,11 +660,7 @@ class PenaltyApp(tk.Tk):
                     num_cache[r.driver_id] = ""
                     continue
                 name_cache[r.driver_id] = f"{(d.first_name or '')} {(d.last_name or '')}".strip()
-                num_cache[r.driver_id] = next(
-                    (e.number or "" for e in d.entries
-                     if e.class_id == sess.class_id and e.event_id == sess.event_id),
-                    ""
-                )
+                num_cache[r.driver_id] = num_by_driver.get(d.id, "")
             for r in officials:
                 self.prev_tv.insert(
                     "", "end",
@@ -679,8 +677,7 @@ class PenaltyApp(tk.Tk):
 
     def apply_preset(self, payload: str):
         # payload shapes: "pos:3" | "time:5" | "dq" | "lap:1"
-        t = payload.split(":")[0]
-        v = payload.split(":")[1] if ":" in payload else ""
+        t, _, v = payload.partition(":")
         self.type_cb.set("POSITION" if t == "pos" else
                          "TIME" if t == "time" else
                          "DQ" if t == "dq" else
@@ -813,6 +810,7 @@ class PenaltyApp(tk.Tk):
             return
         
         try:
+            from sheets_publish import publish_all, publish_class_results_view, publish_raw_results, publish_raw_points
             # Write official results + award points (transaction inside)
             with SessionLocal() as db:
                 write_official_and_award_points(db, sid, scheme_name=CFG.app.points_scheme)
@@ -826,9 +824,8 @@ class PenaltyApp(tk.Tk):
                 # Optionally maintain normalized Raw tabs if enabled
                 if getattr(CFG.app, "publish_raw_tabs", False):
                     try:
-                        publish_raw_results(sid)
-                        if CFG.app.publish_points:
-                            publish_raw_points(sid)
+                        # independent tabs: write them side by side
+                        publish_all(sid, (publish_raw_results, publish_raw_points))
                     except Exception:
                         pass
 
@@ -855,13 +852,9 @@ class PenaltyApp(tk.Tk):
             messagebox.showerror("Config Error", "Google service account not configured! Set GS_SERVICE_JSON_PATH or GS_SERVICE_JSON_RAW.")
             return
         try:
-            from sheets_publish import publish_raw_heat_totals
-            publish_class_heat_totals_view(sess.class_id, sess.event_id)
-            if getattr(CFG.app, "publish_raw_tabs", False):
-                try:
-                    publish_raw_heat_totals(sess.class_id, sess.event_id)
-                except Exception:
-                    pass
+            from sheets_publish import publish_event_class_bundle
+            # view tab plus its Raw_* twin (when raw tabs are enabled) in one write
+            publish_event_class_bundle(sess.class_id, sess.event_id, force=True, prefinal=False)
             messagebox.showinfo("Published", "Heat totals published and class views updated.")
             self.status.set("Heat totals published for class.")
         except Exception as e:
@@ -880,12 +873,9 @@ class PenaltyApp(tk.Tk):
             messagebox.showerror("Config Error", "Google service account not configured! Set GS_SERVICE_JSON_PATH or GS_SERVICE_JSON_RAW.")
             return
         try:
-            publish_class_prefinal_view(sess.class_id, sess.event_id)
-            if getattr(CFG.app, "publish_raw_tabs", False):
-                try:
-                    publish_raw_prefinal_grid(sess.class_id, sess.event_id)
-                except Exception:
-                    pass
+            from sheets_publish import publish_event_class_bundle
+            # view tab plus its Raw_* twin (when raw tabs are enabled) in one write
+            publish_event_class_bundle(sess.class_id, sess.event_id, force=True, heat_totals=False)
             messagebox.showinfo("Published", "Prefinal grid published for this class.")
             self.status.set("Prefinal grid published for class.")
         except Exception as e: